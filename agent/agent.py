@@ -28,8 +28,8 @@ class WorkforceAgent:
         if llm_decision["intent"] == "CHANGE":
             new_payload = llm_decision["new_request_json"]
 
-            # Call API
-            api_result = self.client.get_schedule(new_payload)
+            # Call API (as a job, so a long solve does not hold one request open)
+            api_result = self.client.solve(new_payload)
 
             if "error" in api_result:
                 return f"I tried to update the schedule, but the solver failed: {api_result['error']}"
@@ -97,5 +97,8 @@ class WorkforceAgent:
 
         if status == "OPTIMAL" or status == "FEASIBLE":
             return f"✅ Done. {thought}\n\nSolver Status: {status}. Optimization Score: {obj_val}.\nThe schedule has been updated to reflect your request."
+        elif result.get("explanation"):
+            conflict = "\n".join(f"- {reason['message']}" for reason in result["explanation"])
+            return f"⚠️ I tried to update the schedule, but it became impossible (Status: {status}). These rules conflict; relax one of them:\n{conflict}"
         else:
             return f"⚠️ I tried to update the schedule, but it became impossible (Status: {status}). Please relax some constraints."
\ No newline at end of file
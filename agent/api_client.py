@@ -1,14 +1,287 @@
-import requests
+import os
+import gzip
+import json
+import time
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+
+import wire
+
+# --- CONFIGURATION ---
+CONNECT_TIMEOUT = float(os.environ.get("SCHEDULER_API_CONNECT_TIMEOUT", 5.0))
+# A synchronous /schedule call holds the connection for the whole solve, so reads get a generous default
+READ_TIMEOUT = float(os.environ.get("SCHEDULER_API_READ_TIMEOUT", 120.0))
+MAX_RETRIES = int(os.environ.get("SCHEDULER_API_MAX_RETRIES", 3))
+BACKOFF_SECONDS = 0.5  # First retry delay; doubles on every attempt unless the server sends Retry-After
+MAX_CONNECTIONS = 20
+
+# Queue full (429) or temporarily unavailable (503): worth trying again later
+RETRY_STATUSES = {429, 503}
+FINISHED_STATUSES = {"done", "failed", "cancelled"}
+COMPRESS_MIN_BYTES = 1024  # Smaller request bodies are not worth gzipping
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response]) -> float:
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass  # HTTP-date form; fall back to backoff
+    return BACKOFF_SECONDS * 2 ** attempt
+
+
+def _client_options(base_url: str, connect_timeout: float, read_timeout: float, max_connections: int,
+                    accept: str) -> dict:
+    # Shared by the sync and async clients: keep-alive pool, split timeouts, gzip-compressed responses
+    return {
+        "base_url": base_url,
+        "timeout": httpx.Timeout(read_timeout, connect=connect_timeout),
+        "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        "headers": {"Accept-Encoding": "gzip", "Accept": accept},
+    }
+
+
+def _body(payload: dict, compress: bool) -> dict:
+    # Request keyword arguments for a JSON body, gzipped when asked to and large enough to gain from it
+    body = wire.encode(payload)
+    headers = {"Content-Type": wire.JSON}
+    if compress and len(body) >= COMPRESS_MIN_BYTES:
+        body = gzip.compress(body)
+        headers["Content-Encoding"] = "gzip"
+    return {"content": body, "headers": headers}
+
+
+def _rows(data: Any) -> Any:
+    # Columnar responses (also nested in jobs and batches) back to the row layout callers work with
+    if not isinstance(data, dict):
+        return data
+    if data.get("layout") == "columnar":
+        return wire.from_columnar(data)
+    if isinstance(data.get("result"), dict):
+        return {**data, "result": _rows(data["result"])}
+    if isinstance(data.get("results"), list):
+        return {**data, "results": [_rows(item) for item in data["results"]]}
+    if isinstance(data.get("front"), list):
+        return {**data, "front": [_rows(point) for point in data["front"]]}
+    return data
+
+
+def _decode(response: httpx.Response) -> Any:
+    return _rows(wire.decode(response.content, response.headers.get("content-type", wire.JSON)))
+
+
+def _error(e: Exception) -> dict:
+    if isinstance(e, httpx.HTTPStatusError):
+        return {"error": f"{e.response.status_code}: {e.response.text}"}
+    return {"error": str(e) or type(e).__name__}
+
 
 class SchedulerAPIClient:
-    def __init__(self, base_url="http://localhost:8000"):
+    """
+    Blocking client for the scheduler API over one pooled keep-alive connection set. Calls time out instead of
+    hanging, and 429/503 answers are retried with backoff. Methods return the JSON body, or {"error": ...}.
+    `accept` picks the wire format (see wire.py; responses always come back in the row layout) and
+    `compress_requests` gzips large request bodies.
+    """
+
+    def __init__(self, base_url="http://localhost:8000", connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, max_retries: int = MAX_RETRIES,
+                 max_connections: int = MAX_CONNECTIONS, accept: str = wire.JSON, compress_requests: bool = False):
         self.base_url = base_url
+        self.max_retries = max_retries
+        self.compress_requests = compress_requests
+        self._client = httpx.Client(**_client_options(base_url, connect_timeout, read_timeout, max_connections,
+                                                      accept))
+
+    def close(self):
+        self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def get_schedule(self, payload: dict) -> dict:
         """Sends the JSON payload to the FastAPI backend."""
-        try:
-            response = requests.post(f"{self.base_url}/schedule", json=payload)
+        return self._call("POST", "/schedule", **_body(payload, self.compress_requests))
+
+    def sweep(self, payload: dict) -> dict:
+        """
+        POST /schedule/sweep: the payload is a monthly request plus `deficit_weights` / `balance_weights`;
+        the answer holds the Pareto front of deficit against imbalance.
+        """
+        return self._call("POST", "/schedule/sweep", **_body(payload, self.compress_requests))
+
+    def submit_job(self, payload: dict) -> dict:
+        """Queues a solve (POST /jobs) and returns its JobInfo right away."""
+        return self._call("POST", "/jobs", **_body(payload, self.compress_requests))
+
+    def get_job(self, job_id: str) -> dict:
+        return self._call("GET", f"/jobs/{job_id}")
+
+    def cancel_job(self, job_id: str) -> dict:
+        return self._call("DELETE", f"/jobs/{job_id}")
+
+    def stop_job(self, job_id: str) -> dict:
+        """Ends a streaming solve early; its stream then finishes with the best schedule found so far."""
+        return self._call("POST", f"/jobs/{job_id}/stop")
+
+    def wait_for_job(self, job_id: str, poll_interval: float = 0.5, timeout: Optional[float] = None) -> dict:
+        """Polls a job until it is done, failed or cancelled (or `timeout` seconds pass) and returns its JobInfo."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            info = self.get_job(job_id)
+            if "job_id" not in info or info["status"] in FINISHED_STATUSES:
+                return info
+            if deadline is not None and time.monotonic() >= deadline:
+                return {"error": f"Job {job_id} did not finish within {timeout}s", "job": info}
+            time.sleep(poll_interval)
+
+    def solve(self, payload: dict, poll_interval: float = 0.5, timeout: Optional[float] = None) -> dict:
+        """
+        Long solves: submits a job and polls it, so no HTTP request stays open for the whole search.
+        Returns the schedule response like get_schedule().
+        """
+        info = self.submit_job(payload)
+        if "job_id" not in info:  # Request failed; JobInfo itself always has an "error" field
+            return info
+        info = self.wait_for_job(info["job_id"], poll_interval, timeout)
+        if "job_id" not in info:  # Request failed; JobInfo itself always has an "error" field
+            return info
+        if info["status"] != "done":
+            return {"error": info.get("error") or f"Job {info['status']}"}
+        return info["result"]
+
+    def stream_schedule(self, payload: dict):
+        """
+        Yields (event, data) pairs from POST /schedule/stream: ("job", {"job_id"}), then one ("solution", response)
+        per improving schedule, then ("done", response) or ("error", {"detail"}).
+        Closing the generator early closes the connection, which stops the search on the server.
+        """
+        # Improving solutions can be far apart, so only the connect timeout applies to the stream
+        with self._client.stream("POST", "/schedule/stream", **_body(payload, self.compress_requests),
+                                 timeout=httpx.Timeout(None, connect=self._client.timeout.connect)) as response:
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {"error": str(e)}
\ No newline at end of file
+            event = None
+            for line in response.iter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    yield event, json.loads(line[len("data: "):])
+
+    def _call(self, method: str, path: str, **kwargs) -> dict:
+        try:
+            return _decode(self._request(method, path, **kwargs))
+        except httpx.HTTPError as e:
+            return _error(e)
+
+    def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self._client.request(method, path, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response.raise_for_status()
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                # Nothing was sent (the server may be restarting), so even a POST is safe to repeat
+                if attempt == self.max_retries:
+                    raise
+            time.sleep(_retry_delay(attempt, response))
+
+
+class AsyncSchedulerAPIClient:
+    """asyncio version of SchedulerAPIClient; get_schedules() fans many rosters out at once."""
+
+    def __init__(self, base_url="http://localhost:8000", connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, max_retries: int = MAX_RETRIES,
+                 max_connections: int = MAX_CONNECTIONS, accept: str = wire.JSON, compress_requests: bool = False):
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        self.compress_requests = compress_requests
+        self._client = httpx.AsyncClient(**_client_options(base_url, connect_timeout, read_timeout, max_connections,
+                                                           accept))
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def get_schedule(self, payload: dict) -> dict:
+        return await self._call("POST", "/schedule", **_body(payload, self.compress_requests))
+
+    async def get_schedules(self, payloads: Iterable[dict], concurrency: Optional[int] = None,
+                            use_jobs: bool = False) -> List[dict]:
+        """
+        Solves many payloads concurrently (at most `concurrency` in flight, default: the pool size) and returns
+        the responses in input order. With `use_jobs` each one goes through the job API with polling.
+        """
+        slots = asyncio.Semaphore(concurrency or self.max_connections)
+
+        async def one(payload: dict) -> dict:
+            async with slots:
+                return await (self.solve(payload) if use_jobs else self.get_schedule(payload))
+
+        return await asyncio.gather(*(one(p) for p in payloads))
+
+    async def sweep(self, payload: dict) -> dict:
+        return await self._call("POST", "/schedule/sweep", **_body(payload, self.compress_requests))
+
+    async def submit_job(self, payload: dict) -> dict:
+        return await self._call("POST", "/jobs", **_body(payload, self.compress_requests))
+
+    async def get_job(self, job_id: str) -> dict:
+        return await self._call("GET", f"/jobs/{job_id}")
+
+    async def cancel_job(self, job_id: str) -> dict:
+        return await self._call("DELETE", f"/jobs/{job_id}")
+
+    async def stop_job(self, job_id: str) -> dict:
+        return await self._call("POST", f"/jobs/{job_id}/stop")
+
+    async def wait_for_job(self, job_id: str, poll_interval: float = 0.5, timeout: Optional[float] = None) -> dict:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            info = await self.get_job(job_id)
+            if "job_id" not in info or info["status"] in FINISHED_STATUSES:
+                return info
+            if deadline is not None and time.monotonic() >= deadline:
+                return {"error": f"Job {job_id} did not finish within {timeout}s", "job": info}
+            await asyncio.sleep(poll_interval)
+
+    async def solve(self, payload: dict, poll_interval: float = 0.5, timeout: Optional[float] = None) -> dict:
+        info = await self.submit_job(payload)
+        if "job_id" not in info:  # Request failed; JobInfo itself always has an "error" field
+            return info
+        info = await self.wait_for_job(info["job_id"], poll_interval, timeout)
+        if "job_id" not in info:  # Request failed; JobInfo itself always has an "error" field
+            return info
+        if info["status"] != "done":
+            return {"error": info.get("error") or f"Job {info['status']}"}
+        return info["result"]
+
+    async def _call(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        try:
+            return _decode(await self._request(method, path, **kwargs))
+        except httpx.HTTPError as e:
+            return _error(e)
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = await self._client.request(method, path, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response.raise_for_status()
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(_retry_delay(attempt, response))
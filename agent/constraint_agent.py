@@ -1,39 +1,147 @@
+import os
 import json
-import calendar
+import asyncio
 import re
-from datetime import date
-from typing import List, Dict, Any
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
 import ollama
+from .fast_parse import fast_parse, normalize
+from .parse_cache import ParseCache, parse_key
+from calendar_index import month_index
 
 # --- CONFIGURATION ---
 MODEL_NAME = "gemma3:27b"  # Or "llama3", whatever you have installed
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST")  # e.g. a stub server in tests; None = Ollama's default
+MAX_CONCURRENCY = int(os.environ.get("CONSTRAINT_PARSE_CONCURRENCY", 4))  # Clauses sent to the model at once
+KEEP_ALIVE = os.environ.get("CONSTRAINT_MODEL_KEEP_ALIVE", "30m")  # How long Ollama keeps the model loaded
+
+
+def split_clauses(text: str) -> List[str]:
+    """Independent sentences of a pasted paragraph: split on ., !, ?, ; and line breaks (not inside numbers)."""
+    return [c.strip() for c in re.split(r"(?<!\d)[.!?;]+|[.!?;]+(?!\d)|\n+", text) if c.strip()]
+
+
+@dataclass
+class ParseResult:
+    constraints: List[Dict[str, Any]] = field(default_factory=list)
+    failures: List[Dict[str, str]] = field(default_factory=list)  # {"clause", "error"} per clause that failed
 
 
 class ConstraintAgent:
+    def __init__(self, cache: Optional[ParseCache] = None, host: Optional[str] = OLLAMA_HOST,
+                 max_concurrency: int = MAX_CONCURRENCY):
+        self.cache = cache if cache is not None else ParseCache()
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self._loop = None
+        self._async_client = None
+        # How each parse was answered: rule-based fast path, cached LLM parse, or a fresh LLM call
+        self.counts = {"requests": 0, "fast_path": 0, "cache_hits": 0, "llm_calls": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        """Counts plus the share of requests that skipped the LLM entirely or were served from the cache."""
+        requests = max(1, self.counts["requests"])
+        llm_requests = max(1, self.counts["requests"] - self.counts["fast_path"])
+        return {
+            **self.counts,
+            "fast_path_share": self.counts["fast_path"] / requests,
+            "cache_hit_rate": self.counts["cache_hits"] / llm_requests,  # Of the requests the fast path passed on
+        }
+
     def parse_constraints(self, user_text: str, year: int, month: int, employee_names: List[str]) -> List[
         Dict[str, Any]]:
-
+        """Blocking wrapper around parse_constraints_async() for callers without an event loop."""
+        result = asyncio.run(self.parse_constraints_async(user_text, year, month, employee_names))
+        for failure in result.failures:
+            print(f"Parsing Error: {failure['clause']!r}: {failure['error']}")
+        return result.constraints
+
+    async def parse_constraints_async(self, user_text: str, year: int, month: int,
+                                      employee_names: List[str]) -> ParseResult:
+        """
+        Splits the text into clauses and parses them concurrently (at most `max_concurrency` model calls at a
+        time). A clause that fails is reported in `failures` instead of spoiling the others.
+        """
         # 1. BUILD THE CHEAT SHEET (Crucial Step!)
         # We calculate exactly which days correspond to which weekdays.
-        cal_obj = calendar.monthcalendar(year, month)
-        num_days = calendar.monthrange(year, month)[1]
-
-        weekdays_map = {0: "Monday", 1: "Tuesday", 2: "Wednesday", 3: "Thursday", 4: "Friday", 5: "Saturday",
-                        6: "Sunday"}
-        weekday_cheat_sheet = []
-
-        for d in range(1, num_days + 1):
-            wd_index = date(year, month, d).weekday()
-            wd_name = weekdays_map[wd_index]
-            # specific format to help the AI: "Day 1 is Sunday", "Day 2 is Monday"...
-            # To save tokens, we can group them: "Sundays: 1, 8, 15..."
-            pass
-
-            # Let's make a grouped cheat sheet
-        sundays = [d for d in range(1, num_days + 1) if date(year, month, d).weekday() == 6]
-        mondays = [d for d in range(1, num_days + 1) if date(year, month, d).weekday() == 0]
-        thursdays = [d for d in range(1, num_days + 1) if date(year, month, d).weekday() == 3]
-        fridays = [d for d in range(1, num_days + 1) if date(year, month, d).weekday() == 4]
+        idx = month_index(year, month)
+        num_days, weekday_days = idx.num_days, idx.weekday_days  # weekday (0=Monday) -> days
+        prefix = self._prompt_prefix(year, month, num_days, weekday_days, idx.holidays, employee_names)
+
+        clauses = split_clauses(user_text)
+        slots = asyncio.Semaphore(self.max_concurrency)
+        outcomes = await asyncio.gather(
+            *(self._parse_clause(c, year, month, num_days, weekday_days, employee_names, prefix, slots)
+              for c in clauses),
+            return_exceptions=True
+        )
+
+        # Merge in clause order, dropping duplicates
+        result = ParseResult()
+        seen = set()
+        for clause, outcome in zip(clauses, outcomes):
+            if isinstance(outcome, Exception):
+                result.failures.append({"clause": clause, "error": str(outcome) or type(outcome).__name__})
+                continue
+            if not outcome:
+                result.failures.append({"clause": clause, "error": "No valid constraints found"})
+            for item in outcome:
+                key = (item["employee_name"], item["day"], item["shift"])
+                if key not in seen:
+                    seen.add(key)
+                    result.constraints.append(item)
+        return result
+
+    async def warm_up(self):
+        """Loads the model into memory ahead of the first parse (and keeps it there for KEEP_ALIVE)."""
+        await self._client().chat(model=MODEL_NAME, messages=[], keep_alive=KEEP_ALIVE)
+
+    async def _parse_clause(self, clause: str, year: int, month: int, num_days: int,
+                            weekday_days: Dict[int, List[int]], employee_names: List[str], prefix: str,
+                            slots: asyncio.Semaphore) -> List[Dict[str, Any]]:
+        self.counts["requests"] += 1
+
+        # Common phrasings are parsed by rules, without the LLM
+        fast = fast_parse(clause, num_days, weekday_days, employee_names)
+        if fast is not None:
+            self.counts["fast_path"] += 1
+            return fast
+
+        key = parse_key(normalize(clause), year, month, employee_names, MODEL_NAME)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.counts["cache_hits"] += 1
+            return cached
+
+        async with slots:
+            # 3. CALL OLLAMA
+            # The prompt prefix is the same for every clause of the month, so Ollama reuses its evaluated prefix
+            self.counts["llm_calls"] += 1
+            response = await self._client().chat(model=MODEL_NAME, keep_alive=KEEP_ALIVE, messages=[
+                {'role': 'system', 'content': prefix},
+                {'role': 'user', 'content': f'User Input: "{clause}"\n\nJSON Output:'}
+            ])
+
+        valid_constraints = self._extract(response['message']['content'], num_days, employee_names)
+        if valid_constraints:
+            # An empty parse is usually a bad answer; caching it would fail the sentence on every later call
+            self.cache.put(key, valid_constraints)
+        return valid_constraints
+
+    def _client(self) -> ollama.AsyncClient:
+        # One client per event loop: asyncio.run() in parse_constraints() starts a new loop every call
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._async_client = loop, ollama.AsyncClient(host=self.host)
+        return self._async_client
+
+    def _prompt_prefix(self, year: int, month: int, num_days: int, weekday_days: Dict[int, List[int]],
+                       holidays: Dict[int, str], employee_names: List[str]) -> str:
+        # Let's make a grouped cheat sheet
+        sundays = weekday_days[6]
+        mondays = weekday_days[0]
+        thursdays = weekday_days[3]
+        fridays = weekday_days[4]
 
         cheat_sheet_text = f"""
         CALENDAR CHEAT SHEET for {month}/{year}:
@@ -42,11 +150,13 @@ class ConstraintAgent:
         - Mondays are days: {mondays}
         - Thursdays are days: {thursdays}
         - Fridays are days: {fridays}
+        - Holidays: {holidays or "none"}
         """
 
         # 2. BUILD THE PROMPT
         # We use "Few-Shot" prompting (giving it examples) to teach it logic.
-        prompt = f"""
+        # Everything but the user's clause, which is sent as its own message after this one.
+        return f"""
         You are an expert Scheduling Assistant. 
         Your goal is to convert Natural Language constraints into a JSON array.
 
@@ -75,44 +185,33 @@ class ConstraintAgent:
             {{ "employee_name": "Shaked", "day": 9, "shift": 0 }}
         ]
 
-        TASK:
-        User Input: "{user_text}"
-
-        JSON Output:
+        TASK: convert the next message.
         """
 
-        try:
-            # 3. CALL OLLAMA
-            response = ollama.chat(model=MODEL_NAME, messages=[
-                {'role': 'user', 'content': prompt}
-            ])
-
-            raw_content = response['message']['content']
-
-            # 4. CLEANUP (Find JSON inside text)
-            # Find the first '[' and the last ']'
-            match = re.search(r'\[.*\]', raw_content, re.DOTALL)
-            if match:
-                json_str = match.group(0)
-            else:
-                # Fallback if it didn't use brackets
-                json_str = raw_content if raw_content.strip().startswith('[') else "[]"
-
-            parsed = json.loads(json_str)
-
-            # 5. VALIDATION
-            valid_constraints = []
-            if isinstance(parsed, list):
-                for item in parsed:
-                    # Validate logic
-                    if item.get("employee_name") in employee_names and 1 <= item.get("day", 0) <= num_days:
-                        valid_constraints.append(item)
-
-            return valid_constraints
-
-        except Exception as e:
-            print(f"Parsing Error: {e}")
-            return []
+    def _extract(self, raw_content: str, num_days: int, employee_names: List[str]) -> List[Dict[str, Any]]:
+        # 4. CLEANUP (Find JSON inside text)
+        # Find the first '[' and the last ']'
+        match = re.search(r'\[.*\]', raw_content, re.DOTALL)
+        if match:
+            json_str = match.group(0)
+        else:
+            # Fallback if it didn't use brackets
+            json_str = raw_content if raw_content.strip().startswith('[') else "[]"
+
+        parsed = json.loads(json_str)
+
+        # 5. VALIDATION
+        valid_constraints = []
+        if isinstance(parsed, list):
+            for item in parsed:
+                # Validate logic
+                if (isinstance(item, dict) and item.get("employee_name") in employee_names
+                        and isinstance(item.get("day"), int) and 1 <= item["day"] <= num_days
+                        and item.get("shift") in (None, 0, 1)):
+                    valid_constraints.append({"employee_name": item["employee_name"], "day": item["day"],
+                                              "shift": item.get("shift")})
+
+        return valid_constraints
 
 
 agent = ConstraintAgent()
\ No newline at end of file
@@ -0,0 +1,163 @@
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+# Deterministic parser for the common phrasings ("Lior is sick on the 5th", "שקד לא יכול ראשון בוקר").
+# It only answers when it understands the whole sentence; anything unusual returns None and goes to the LLM.
+
+EN_WEEKDAYS = {"monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6}
+HE_WEEKDAYS = {"ראשון": 6, "שני": 0, "שלישי": 1, "רביעי": 2, "חמישי": 3, "שישי": 4, "שבת": 5}
+
+# A Hebrew word with an optional one-letter prefix (ב, ה, ו, ל), never part of a longer word ("לא" is not in "לאה")
+HE_WORD = r"(?<![֐-׿])(?:[בהול]-?)?(?:{})(?![֐-׿])"
+
+# Some wording must be present: the parser only ever produces unavailability
+UNAVAILABLE = re.compile(
+    r"\b(can'?t|cannot|can not|unavailable|not available|sick|off|vacation|holiday|leave|busy|away|"
+    r"won'?t|doesn'?t|isn'?t)\b|" + HE_WORD.format("לא|חולה|חולים|חופש|חופשה|מילואים")
+)
+# Once names, days, weekdays, shifts and filler words are taken out, what is left of the clause must be exactly
+# one of these; "won't mind working the 5th" or "took the 3rd off and can cover the 4th" go to the LLM
+EN_PREDICATE = re.compile(
+    r"(?:(?:is|are|'s|'re|will be|'ll be|has|have|gets|takes|took|is taking)\s+)?"
+    r"(?:sick(?: leave)?|off(?: sick)?|out(?: sick)?|unavailable|away|busy|vacation|leave|holidays?)|"
+    r"(?:(?:is|are|'s|'re)\s+)?(?:can'?t|cannot|can not|won'?t|will not|doesn'?t|does not|don'?t|do not|not|"
+    r"unable to|(?:isn'?t|is not|aren'?t|are not)(?: able to)?)(?:\s+be)?"
+    r"(?:\s+(?:work|working|come|coming|make it|do|cover|take|available|there|free|around))?"
+)
+HE_PREDICATE = re.compile(
+    r"(?:(?:הוא|היא|הם|הן)\s+)?(?:ו?לא(?:\s+(?:יכול|יכולה|יכולים|יכולות|זמין|זמינה|זמינים|זמינות|פנוי|פנויה|"
+    r"פנויים|פנויות|עובד|עובדת|עובדים|עובדות|מגיע|מגיעה|מגיעים|מגיעות)(?:\s+(?:לעבוד|להגיע|לבוא))?)?|"
+    r"חולה|חולים|ב?חופש|ב?חופשה|ב?מילואים)"
+)
+FILLER = re.compile(r"\b(?:the|on|of|at|in|for|during|a|any|this|day|days|shift|shifts|month)\b|"
+                    + HE_WORD.format("יום|ימי|משמרת|משמרות|את|של") + r"|(?<![֐-׿])[בהולמ]-?(?![֐-׿])|[:\-–—]")
+# Qualifiers the parser does not model (exceptions, partial weeks, other months, ...)
+UNSUPPORTED = re.compile(
+    r"\b(except|but|only|unless|other|week|weeks|weekend|weekends|half|first|last|next|before|after|since|"
+    r"january|february|march|april|may|june|july|august|september|october|november|december)\b|"
+    r"חוץ|אבל|רק|שבוע|סופ\"ש|אחרי|לפני|"
+    r"\d+\s*(?:days?\b|shifts?\b|times?\b|hours?\b|am\b|pm\b|:|ימים|משמרות|שעות)|\bin a row\b|"
+    # Clock times, hour ranges and shift numbers: a bare number after these is rarely a day of the month
+    r"\b(?:at|shift|till|until|from|between|around)\s+\d+(?!\d)(?!st\b|nd\b|rd\b|th\b)|שעה|בשעה|\bo'?clock\b"
+)
+ALL_MONTH = re.compile(r"\b(all|whole|entire) month\b|\bevery day\b|כל החודש")
+MORNING = re.compile(r"\bmornings?\b|\bday shifts?\b|בוקר|בקרים")
+NIGHT = re.compile(r"\bnights?\b|\bevenings?\b|\bnight shifts?\b|לילה|לילות|ערב")
+DAY_RANGES = [
+    re.compile(r"\bbetween\s+(?:the\s+)?(\d+)(?:st|nd|rd|th)?\s+and\s+(?:the\s+)?(\d+)(?:st|nd|rd|th)?"),
+    re.compile(r"(?:\bfrom\s+(?:the\s+)?)?(\d+)(?:st|nd|rd|th)?\s*(?:-|–|—|\bto\b|\bthrough\b|\btill\b|\buntil\b|עד)"
+               r"\s*(?:the\s+)?(\d+)(?:st|nd|rd|th)?"),
+]
+OPEN_RANGE = re.compile(r"\b(?:from|to|until|till|through|between)\b|עד")
+NUMBER = re.compile(r"\d+")
+# A number only counts as a day when it is an ordinal or follows "the", "on" or a Hebrew prefix ("ב-5"); the
+# far end of a range whose near end is such a day counts too ("on 20-25", "from the 5th to 10")
+MARKED_DAY = r"(?:(?:\b(?:the|on)\s+|(?<![֐-׿])[בהלמ]-?)(?:the\s+)?\d+(?:st|nd|rd|th)?|\d+(?:st|nd|rd|th))\b"
+MARKED_DAYS = [
+    re.compile(MARKED_DAY + r"\s*(?:-|–|—|\bto\b|\bthrough\b|\btill\b|\buntil\b|\band\b|עד)\s*(?:the\s+)?\d+(?:st|nd|rd|th)?\b"),
+    re.compile(MARKED_DAY),
+]
+DAY_NUMBER = re.compile(r"(?<![֐-׿])(?:[בהול]-?)?\d+(?:st|nd|rd|th)?\b")
+# Optional one-letter prefix (ב, ה, ו, ל); "שני" also means "two", so it needs "יום"/"ימי" or "ב" before it
+WEEKDAYS = [(wd, re.compile(rf"\b{name}s?\b")) for name, wd in EN_WEEKDAYS.items()] + [
+    (wd, re.compile(rf"(?<![֐-׿])(?:ב?(?:יום|ימי)\s+|ב-?){name}(?![֐-׿])" if name == "שני" else
+                    rf"(?<![֐-׿])(?:ב?(?:יום|ימי)\s+)?[בהול]?-?{name}(?![֐-׿])"))
+    for name, wd in HE_WEEKDAYS.items()
+]
+NAME_SEPARATOR = r"(?:\s*,\s*|\s*&\s*|\s+and\s+)"
+
+
+def normalize(text: str) -> str:
+    """Lower case, single spaces, no trailing punctuation: the form both the fast path and the cache key use."""
+    return re.sub(r"\s+", " ", text).strip().lower().rstrip(".!?")
+
+
+def _weekdays(text: str) -> set:
+    return {wd for wd, pattern in WEEKDAYS if pattern.search(text)}
+
+
+def _subject(text: str, employee_names: List[str]) -> Optional[Tuple[List[str], str]]:
+    """
+    The employees a clause is about and the clause without them. Several names only form one subject when they
+    are listed side by side ("Lior and Amir are off on the 5th"); names in different places pair each with its
+    own days ("Lior is off on the 5th, Amir is off on the 9th"), which is left to the LLM.
+    """
+    if not employee_names:
+        return None
+    by_lower = {n.lower(): n for n in employee_names}
+    name = "(?<!\\w)(?:{})(?!\\w)".format("|".join(re.escape(n) for n in sorted(by_lower, key=len, reverse=True)))
+    groups = list(re.finditer(rf"{name}(?:{NAME_SEPARATOR}{name})*", text))
+    if len(groups) != 1:
+        return None
+    found = re.findall(name, groups[0].group(0))
+    if len(set(found)) < len(found):
+        return None
+    return [by_lower[n] for n in found], f"{text[:groups[0].start()]} {text[groups[0].end():]}"
+
+
+def _is_plain(rest: str) -> bool:
+    """True when a clause without its names says nothing but that they are unavailable on its days and shifts."""
+    for pattern in [*DAY_RANGES, DAY_NUMBER, ALL_MONTH, MORNING, NIGHT, *(p for _, p in WEEKDAYS)]:
+        rest = pattern.sub(" # ", rest)
+    rest = FILLER.sub(" ", rest)
+    rest = re.sub(r"#(?:\s*(?:,|&|\band\b|\bor\b)?\s*#)*", " ", rest)  # Lists of days, weekdays or shifts
+    rest = re.sub(r"\s+", " ", rest).strip(" ,")
+    return bool(EN_PREDICATE.fullmatch(rest) or HE_PREDICATE.fullmatch(rest))
+
+
+def fast_parse(user_text: str, num_days: int, weekday_days: Dict[int, List[int]],
+               employee_names: List[str]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Constraints for a single-clause sentence saying that one employee (or several listed together) is unavailable
+    on some days (single days, ranges, weekday recurrences or the whole month), optionally only mornings or nights;
+    None when the sentence needs the LLM. `weekday_days` maps a weekday (0=Monday) to its days of the month.
+    """
+    text = normalize(user_text)
+    if not UNAVAILABLE.search(text) or UNSUPPORTED.search(text) or re.search(r"[.;\n]", text):
+        return None
+
+    subject = _subject(text, employee_names)
+    if subject is None:
+        return None
+    names, text = subject
+    if not _is_plain(text):
+        return None
+
+    morning, night = bool(MORNING.search(text)), bool(NIGHT.search(text))
+    if morning and night:
+        return None  # "morning of the 5th and night of the 6th" pairs shifts with days
+    shift = 0 if morning else 1 if night else None
+
+    unmarked = text
+    for pattern in MARKED_DAYS:
+        unmarked = pattern.sub(" ", unmarked)
+    if NUMBER.search(unmarked):
+        return None  # "at 6", "shift 2", "from 8 to 10": a number that need not be a day
+
+    days = set()
+    remaining = text
+    for pattern in DAY_RANGES:
+        for lo, hi in pattern.findall(remaining):
+            lo, hi = int(lo), int(hi)
+            if not 1 <= lo <= hi <= num_days:
+                return None
+            days.update(range(lo, hi + 1))
+        remaining = pattern.sub(" ", remaining)
+    if OPEN_RANGE.search(remaining):
+        return None  # "until the 10th" has no start day
+    for n in NUMBER.findall(remaining):
+        if not 1 <= int(n) <= num_days:
+            return None  # Years, times, other months' days...
+        days.add(int(n))
+
+    weekdays = _weekdays(text)
+    if weekdays:
+        if days:
+            return None  # "Sunday the 5th" is ambiguous between a date and a recurrence
+        days = {d for wd in weekdays for d in weekday_days[wd]}
+    elif ALL_MONTH.search(text) and not days:
+        days = set(range(1, num_days + 1))
+    if not days:
+        return None
+
+    return [{"employee_name": name, "day": day, "shift": shift} for name in names for day in sorted(days)]
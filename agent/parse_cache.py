@@ -0,0 +1,78 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+# --- CONFIGURATION ---
+PARSE_CACHE_SIZE = int(os.environ.get("CONSTRAINT_CACHE_SIZE", 1024))  # In-memory entries
+# SQLite file that keeps LLM parses across restarts; set to an empty string for a memory-only cache
+PARSE_CACHE_DB = os.environ.get("CONSTRAINT_CACHE_DB",
+                                os.path.join(os.path.expanduser("~"), ".cache", "workforce_scheduler", "parses.db"))
+
+# Bump when the prompt changes in a way that makes old parses stale
+PARSE_CACHE_VERSION = 2
+
+
+def parse_key(normalized_text: str, year: int, month: int, employee_names: List[str], model: str) -> str:
+    """The same sentence means different days in another month, and different names with another roster."""
+    blob = json.dumps({
+        "v": PARSE_CACHE_VERSION,
+        "text": normalized_text,
+        "year": year,
+        "month": month,
+        "roster": sorted(employee_names),
+        "model": model,
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    """
+    LLM parses by parse_key(): an in-memory LRU in front of an optional SQLite table.
+    The file is opened on first use, so importing the agent never touches the disk.
+    """
+
+    def __init__(self, db_path: Optional[str] = PARSE_CACHE_DB, max_entries: int = PARSE_CACHE_SIZE):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            elif self._db() is not None:
+                row = self._conn.execute("SELECT value FROM parses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value = row[0]
+                    self._remember(key, value)
+        return None if value is None else json.loads(value)
+
+    def put(self, key: str, constraints: List[Dict[str, Any]]):
+        value = json.dumps(constraints, separators=(",", ":"))
+        with self._lock:
+            self._remember(key, value)
+            if self._db() is not None:
+                self._conn.execute("INSERT OR REPLACE INTO parses (key, value) VALUES (?, ?)", (key, value))
+                self._conn.commit()
+
+    def _remember(self, key: str, value: str):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        # Called with the lock held
+        if self._conn is None and self.db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS parses (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.commit()
+        return self._conn
@@ -0,0 +1,63 @@
+import time
+import asyncio
+from typing import AsyncIterator
+
+from models import ScheduleRequest, ScheduleResponse, BatchScheduleRequest, BatchItemResult
+from jobs import SolverJobQueue, QueueFullError
+
+# How long a batch item waits before retrying when other traffic has filled the queue
+RETRY_DELAY = 0.05
+
+
+async def _solve_item(queue: SolverJobQueue, slots: asyncio.Semaphore, index: int,
+                      request: ScheduleRequest) -> BatchItemResult:
+    job_id = None
+    try:
+        async with slots:
+            # Feed the pool one slot at a time: the batch never floods the shared queue, it waits its turn
+            while job_id is None:
+                try:
+                    job_id = queue.submit(request)
+                except QueueFullError:
+                    await asyncio.sleep(RETRY_DELAY)
+
+            result = await asyncio.wrap_future(queue.future(job_id))
+
+        return BatchItemResult(index=index, status="done", result=ScheduleResponse.model_validate(result))
+
+    except asyncio.CancelledError:
+        # Deadline or disconnect: release the pool slot if the solve has not started yet
+        if job_id is not None:
+            queue.cancel(job_id)
+        raise
+    except Exception as e:
+        # One bad site must not take the rest of the batch down with it
+        return BatchItemResult(index=index, status="failed", error=str(e))
+
+
+async def solve_batch(queue: SolverJobQueue, batch: BatchScheduleRequest) -> AsyncIterator[BatchItemResult]:
+    """
+    Solves every request of the batch on the shared pool and yields results as they finish (not in order).
+    Items not finished when the deadline passes (queued or solving) are reported as timeouts.
+    """
+    deadline = None if batch.deadline_seconds is None else time.monotonic() + batch.deadline_seconds
+    slots = asyncio.Semaphore(queue.max_workers)
+
+    async def bounded(index: int, request: ScheduleRequest) -> BatchItemResult:
+        if deadline is None:
+            return await _solve_item(queue, slots, index, request)
+        try:
+            # The deadline also covers time spent waiting for a slot
+            return await asyncio.wait_for(_solve_item(queue, slots, index, request),
+                                          max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            return BatchItemResult(index=index, status="timeout", error="Batch deadline reached")
+
+    tasks = [asyncio.ensure_future(bounded(i, r)) for i, r in enumerate(batch.requests)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client disconnected mid-stream: stop feeding the pool
+        for t in tasks:
+            t.cancel()
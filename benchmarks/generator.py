@@ -0,0 +1,112 @@
+import math
+import random
+from dataclasses import dataclass, asdict
+from typing import List
+
+from models import ScheduleRequest, EmployeeConfig, UnavailabilityConstraint, SolverConfig
+from calendar_index import month_index
+
+# Part-timers, regulars and people who pick up extra shifts, relative to an even share of the month
+LOAD_FACTORS = [0.5, 0.75, 1.0, 1.0, 1.0, 1.25]
+
+
+@dataclass(frozen=True)
+class InstanceSpec:
+    """Everything needed to regenerate one benchmark instance. The same spec always yields the same request."""
+    num_employees: int
+    year: int
+    month: int
+    unavailability: float = 0.1  # Chance an employee blocks a given day (or one shift of it)
+    shabbat_pressure: float = 0.5  # Share of the month's Shabbat slots claimed by min_shabbat quotas
+    night_only_share: float = 0.1  # Share of employees with shabbat_night_only
+    seed: int = 0
+    timeout_seconds: float = 10.0
+
+    @property
+    def name(self) -> str:
+        return (f"e{self.num_employees}-{self.year}-{self.month:02d}-u{self.unavailability:g}"
+                f"-s{self.shabbat_pressure:g}-n{self.night_only_share:g}-seed{self.seed}")
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _shabbat_slots(year: int, month: int):
+    """(Shabbat slots, Saturday night slots) of a month: Friday night, Saturday morning and Saturday night."""
+    idx = month_index(year, month)
+    fridays, saturdays = int(idx.shabbat_eve.sum()), int(idx.shabbat_day.sum())
+    return fridays + 2 * saturdays, saturdays
+
+
+def generate_request(spec: InstanceSpec) -> ScheduleRequest:
+    """
+    Builds a realistic roster for `spec`: total min_shifts stays below the month's demand and the Shabbat
+    minimums below the available Shabbat slots, so instances are hard but normally feasible.
+    """
+    rnd = random.Random(spec.seed * 1_000_003 + spec.num_employees * 101 + spec.year * 13 + spec.month)
+    num_days = month_index(spec.year, spec.month).num_days
+    shabbat_slots, saturday_nights = _shabbat_slots(spec.year, spec.month)
+    even_share = 2 * num_days / spec.num_employees
+
+    names = [f"Emp{i:03d}" for i in range(spec.num_employees)]
+    night_only = {n for n in names if rnd.random() < spec.night_only_share}
+
+    # Hand out the Shabbat minimums one slot at a time so their sum never exceeds what the month offers
+    min_shabbat = dict.fromkeys(names, 0)
+    for _ in range(int(shabbat_slots * spec.shabbat_pressure)):
+        name = rnd.choice(names)
+        if min_shabbat[name] < (saturday_nights if name in night_only else 3):
+            min_shabbat[name] += 1
+
+    employees: List[EmployeeConfig] = []
+    for name in names:
+        load = even_share * rnd.choice(LOAD_FACTORS)
+        max_shifts = max(1, math.ceil(load * 1.3), min_shabbat[name])
+        employees.append(EmployeeConfig(
+            name=name,
+            min_shifts=min(int(load * 0.8), max_shifts),
+            max_shifts=max_shifts,
+            min_shabbat=min_shabbat[name],
+            max_shabbat=min_shabbat[name] + rnd.randint(1, 2),
+            shabbat_night_only=name in night_only
+        ))
+
+    constraints: List[UnavailabilityConstraint] = []
+    for name in names:
+        for day in range(1, num_days + 1):
+            if rnd.random() < spec.unavailability:
+                # Most requests block a whole day; the rest one shift of it
+                shift = rnd.choice([None, None, None, 0, 1])
+                constraints.append(UnavailabilityConstraint(employee_name=name, day=day, shift=shift))
+
+    return ScheduleRequest(
+        year=spec.year,
+        month=spec.month,
+        employees=employees,
+        constraints=constraints,
+        config=SolverConfig(timeout_seconds=spec.timeout_seconds, random_seed=spec.seed)
+    )
+
+
+def suite(name: str, year: int = 2025, timeout_seconds: float = 10.0) -> List[InstanceSpec]:
+    """
+    Named instance sets. `quick` is a smoke run for every change; `full` sweeps 5-500 employees over
+    all 12 months with varying unavailability, Shabbat pressure and night-only mixes.
+    """
+    if name == "quick":
+        return [
+            InstanceSpec(num_employees=n, year=year, month=month, unavailability=u, timeout_seconds=timeout_seconds)
+            for n in (5, 20, 60)
+            for month in (2, 7)
+            for u in (0.0, 0.15)
+        ]
+    if name == "full":
+        mixes = [(0.0, 0.3, 0.0), (0.1, 0.5, 0.1), (0.25, 0.8, 0.3)]
+        return [
+            InstanceSpec(num_employees=n, year=year, month=month, unavailability=u, shabbat_pressure=s,
+                         night_only_share=night, timeout_seconds=timeout_seconds)
+            for n in (5, 10, 25, 50, 100, 250, 500)
+            for month in range(1, 13)
+            for u, s, night in mixes
+        ]
+    raise ValueError(f"Unknown suite: {name}")
@@ -0,0 +1,280 @@
+"""
+Offline load test of the HTTP API. For every configuration it starts `uvicorn main:app` locally, replays a mix
+of synthetic ScheduleRequests against POST /schedule and reports throughput, p50/p95/p99 latency, error and
+timeout rates and the CPU time of the server and its solver workers.
+
+    python -m benchmarks.loadtest --concurrency 8 --duration 30
+    python -m benchmarks.loadtest --rate 4 --duration 60 --workers 1,2,4 --cache on,off --out load.json
+    python -m benchmarks.loadtest --solver-timeout 1,5 --mix 5:3,20:2,60:1 --distinct 50
+
+`--concurrency` keeps that many planners waiting on a response at all times (closed loop); `--rate` sends
+requests at random (Poisson) arrival times regardless of how fast they are answered (open loop), and measures
+latency from the planned send time so a backed-up server is not hidden. Linux only (CPU time comes from /proc).
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import itertools
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.generator import InstanceSpec, generate_request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MIX = "5:3,20:2,60:1"  # employees:weight
+STARTUP_TIMEOUT = 30.0
+UNAVAILABILITY = (0.0, 0.1, 0.2)
+
+
+def parse_mix(mix: str) -> List[Tuple[int, int]]:
+    pairs = []
+    for item in mix.split(","):
+        employees, _, weight = item.partition(":")
+        pairs.append((int(employees), int(weight or 1)))
+    return pairs
+
+
+def build_payloads(mix: List[Tuple[int, int]], distinct: int, solver_timeout: float, year: int = 2025,
+                   seed: int = 0) -> List[dict]:
+    """
+    `distinct` different requests drawn from the weighted roster sizes of `mix`, over random months and
+    unavailability. The load replays them round-robin, so with the cache on repeats are served from it.
+    """
+    rnd = random.Random(seed)
+    sizes, weights = zip(*mix)
+    payloads = []
+    for i in range(distinct):
+        spec = InstanceSpec(num_employees=rnd.choices(sizes, weights)[0], year=year, month=rnd.randint(1, 12),
+                            unavailability=rnd.choice(UNAVAILABILITY), seed=seed + i,
+                            timeout_seconds=solver_timeout)
+        payloads.append(generate_request(spec).model_dump(mode="json"))
+    return payloads
+
+
+# --- Server ---
+
+def start_server(port: int, workers: int, cache: bool, max_queued: int) -> subprocess.Popen:
+    env = dict(os.environ, SCHEDULER_WORKERS=str(workers), SCHEDULER_MAX_QUEUED=str(max_queued))
+    if not cache:
+        # A zero-entry cache forgets every solution as soon as it is stored
+        env.update(SCHEDULER_CACHE_SIZE="0", SCHEDULER_CACHE_DB="")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env)
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API server exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1.0).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    stop_server(proc)
+    raise RuntimeError(f"API server did not start within {STARTUP_TIMEOUT:g}s")
+
+
+def stop_server(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def process_tree_cpu(pid: int) -> float:
+    """User + system CPU seconds of `pid` and all its descendants (the solver pool), read from /proc."""
+    ticks = os.sysconf("SC_CLK_TCK")
+    children: Dict[int, List[int]] = {}
+    cpu: Dict[int, float] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the fields after it are fixed
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue  # Exited while we were looking
+        children.setdefault(int(fields[1]), []).append(int(entry))
+        cpu[int(entry)] = (int(fields[11]) + int(fields[12])) / ticks
+
+    total, stack = 0.0, [pid]
+    while stack:
+        p = stack.pop()
+        total += cpu.get(p, 0.0)
+        stack.extend(children.get(p, []))
+    return total
+
+
+# --- Load ---
+
+async def _send(client: httpx.AsyncClient, payload: dict, started: float) -> dict:
+    sample = {"outcome": "ok", "status": None, "cache_hit": False}
+    try:
+        response = await client.post("/schedule", json=payload)
+        if response.status_code == 429:
+            sample["outcome"] = "rejected"  # Queue full
+        elif response.status_code >= 400:
+            sample["outcome"] = "error"
+        else:
+            meta = response.json()["metadata"]
+            sample.update(status=meta["status"], cache_hit=meta.get("cache_hit", False))
+    except httpx.TimeoutException:
+        sample["outcome"] = "timeout"
+    except httpx.HTTPError:
+        sample["outcome"] = "error"
+    sample["latency"] = time.perf_counter() - started
+    return sample
+
+
+async def drive(base_url: str, payloads: List[dict], duration: float, concurrency: Optional[int] = None,
+                rate: Optional[float] = None, request_timeout: float = 60.0, seed: int = 0) -> List[dict]:
+    """Sends requests for `duration` seconds (closed loop with `concurrency`, or open loop at `rate` per second)."""
+    requests = itertools.cycle(payloads)
+    limits = httpx.Limits(max_connections=concurrency or None, max_keepalive_connections=concurrency or None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=request_timeout, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        if rate is None:
+            async def planner() -> List[dict]:
+                samples = []
+                while time.perf_counter() < deadline:
+                    samples.append(await _send(client, next(requests), time.perf_counter()))
+                return samples
+
+            return [s for samples in await asyncio.gather(*(planner() for _ in range(concurrency)))
+                    for s in samples]
+
+        rnd = random.Random(seed)
+        tasks = []
+        planned = time.perf_counter()
+        while planned < deadline:
+            await asyncio.sleep(max(0.0, planned - time.perf_counter()))
+            # Latency counts from the planned send time, so a stalled event loop shows up in it
+            tasks.append(asyncio.create_task(_send(client, next(requests), planned)))
+            planned += rnd.expovariate(rate)
+        return list(await asyncio.gather(*tasks))
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    # Nearest-rank percentile: an actual observed latency, never an interpolation
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+def summarize(samples: List[dict], elapsed: float, cpu_seconds: float) -> dict:
+    total = len(samples)
+    ok = [s for s in samples if s["outcome"] == "ok"]
+    latencies = [s["latency"] for s in ok]
+    statuses: Dict[str, int] = {}
+    for s in ok:
+        statuses[s["status"]] = statuses.get(s["status"], 0) + 1
+
+    def rate(outcome: str) -> float:
+        return sum(s["outcome"] == outcome for s in samples) / total if total else 0.0
+
+    return {
+        "requests": total,
+        "elapsed": elapsed,
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "latency_p50": _percentile(latencies, 50),
+        "latency_p95": _percentile(latencies, 95),
+        "latency_p99": _percentile(latencies, 99),
+        "latency_max": max(latencies) if latencies else None,
+        "error_rate": rate("error"),
+        "timeout_rate": rate("timeout"),
+        "rejected_rate": rate("rejected"),
+        "cache_hit_rate": sum(s["cache_hit"] for s in ok) / len(ok) if ok else 0.0,
+        "statuses": statuses,
+        "cpu_seconds": cpu_seconds,
+        # Share of the whole machine the server used while under load
+        "cpu_utilization": cpu_seconds / (elapsed * (os.cpu_count() or 1)) if elapsed else 0.0,
+    }
+
+
+def run_config(workers: int, solver_timeout: float, cache: bool, args) -> dict:
+    payloads = build_payloads(parse_mix(args.mix), args.distinct, solver_timeout, seed=args.seed)
+    proc = start_server(args.port, workers, cache, args.max_queued)
+    try:
+        cpu_before = process_tree_cpu(proc.pid)
+        start = time.perf_counter()
+        samples = asyncio.run(drive(f"http://127.0.0.1:{args.port}", payloads, args.duration,
+                                    concurrency=args.concurrency, rate=args.rate,
+                                    request_timeout=args.request_timeout, seed=args.seed))
+        elapsed = time.perf_counter() - start
+        cpu_seconds = process_tree_cpu(proc.pid) - cpu_before
+    finally:
+        stop_server(proc)
+    config = {"workers": workers, "solver_timeout": solver_timeout, "cache": cache}
+    return {"config": config, **summarize(samples, elapsed, cpu_seconds)}
+
+
+def _format(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.3f}s"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the scheduler API on this machine")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, help="Planners with a request in flight at all times (default: 4)")
+    load.add_argument("--rate", type=float, help="Requests per second, sent at random arrival times")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load per configuration")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Roster sizes and weights, e.g. 5:3,20:2,60:1")
+    parser.add_argument("--distinct", type=int, default=20, help="Different requests replayed round-robin")
+    parser.add_argument("--workers", default=str(os.cpu_count() or 1), help="Comma-separated SCHEDULER_WORKERS")
+    parser.add_argument("--solver-timeout", default="2", help="Comma-separated solver time limits (seconds)")
+    parser.add_argument("--cache", default="on", help="Comma-separated on/off")
+    parser.add_argument("--max-queued", type=int, default=16, help="SCHEDULER_MAX_QUEUED of the server")
+    parser.add_argument("--request-timeout", type=float, default=60.0, help="Client timeout per request")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write results JSON here (default: stdout)")
+    args = parser.parse_args(argv)
+    if args.rate is None and args.concurrency is None:
+        args.concurrency = 4
+
+    configs = itertools.product([int(w) for w in args.workers.split(",")],
+                                [float(t) for t in args.solver_timeout.split(",")],
+                                [c.strip() == "on" for c in args.cache.split(",")])
+    results = []
+    for workers, solver_timeout, cache in configs:
+        result = run_config(workers, solver_timeout, cache, args)
+        results.append(result)
+        print(f"workers={workers} solver_timeout={solver_timeout:g}s cache={'on' if cache else 'off'}: "
+              f"{result['throughput_rps']:.2f} req/s p50={_format(result['latency_p50'])} "
+              f"p95={_format(result['latency_p95'])} p99={_format(result['latency_p99'])} "
+              f"errors={result['error_rate']:.1%} timeouts={result['timeout_rate']:.1%} "
+              f"rejected={result['rejected_rate']:.1%} cpu={result['cpu_utilization']:.0%}", file=sys.stderr)
+
+    report = {
+        "load": {"concurrency": args.concurrency, "rate": args.rate, "duration": args.duration, "mix": args.mix,
+                 "distinct": args.distinct, "request_timeout": args.request_timeout},
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "results": results
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
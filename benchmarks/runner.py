@@ -0,0 +1,177 @@
+"""
+Offline, CPU-only benchmark of the scheduling engine.
+
+    python -m benchmarks.runner --suite quick
+    python -m benchmarks.runner --suite full --out results.json
+    python -m benchmarks.runner --suite quick --update-baseline
+    python -m benchmarks.runner --suite full --engine lns --out lns.json --baseline lns-baseline.json
+
+Every instance runs in a fresh process so peak memory is measured per solve and not inherited from the
+previous one. Results are compared against benchmarks/baseline.json; the exit code is 1 on a regression.
+Each result carries the `objective_trace` of its solve, so two engines can be compared by quality over time.
+"""
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import platform
+import statistics
+import multiprocessing
+from typing import List, Optional
+
+from core import WorkforceSchedulerEngine
+from lns import LNSEngine
+from benchmarks.generator import InstanceSpec, generate_request, suite
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Timings compared against the baseline; a metric regresses when it is both THRESHOLD times slower
+# and more than MIN_DELTA seconds (MiB for memory) worse, so sub-millisecond noise is never flagged
+METRICS = ["build_time", "first_solution_time", "optimal_time", "serialize_time", "peak_memory_mb"]
+THRESHOLD = 1.3
+MIN_DELTA = {"build_time": 0.05, "first_solution_time": 0.05, "optimal_time": 0.1, "serialize_time": 0.01,
+             "peak_memory_mb": 16.0}
+
+
+def _peak_memory_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS; unlike tracemalloc it covers CP-SAT's native memory too
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_instance(spec_dict: dict, engine: str = "cp-sat") -> dict:
+    """Generates and solves one instance. Runs in its own process (see run_suite)."""
+    spec = InstanceSpec(**spec_dict)
+    request = generate_request(spec)
+    request.config.engine = engine
+
+    start = time.perf_counter()
+    response = (LNSEngine if engine == "lns" else WorkforceSchedulerEngine)(request).solve()
+    total = time.perf_counter() - start
+    meta = response.metadata
+
+    return {
+        "name": spec.name,
+        "spec": spec.to_dict(),
+        "status": meta.status,
+        "objective_value": meta.objective_value,
+        "solutions": len(meta.objective_trace),
+        "build_time": meta.build_time,
+        "first_solution_time": meta.first_solution_time,
+        # Only meaningful when the solver proved optimality inside the time limit
+        "optimal_time": meta.wall_time if meta.status == "OPTIMAL" else None,
+        "solve_time": meta.wall_time,
+        "serialize_time": meta.serialize_time,
+        "total_time": total,
+        "peak_memory_mb": _peak_memory_mb(),
+        # Quality over time, to compare engines: (seconds into the search, objective) per improving schedule
+        "objective_trace": meta.objective_trace
+    }
+
+
+def _median_run(runs: List[dict]) -> dict:
+    # Per-metric median over repeated runs; the first run supplies status, objective and the rest
+    result = dict(runs[0])
+    for metric in METRICS + ["solve_time", "total_time"]:
+        values = [r[metric] for r in runs if r[metric] is not None]
+        result[metric] = statistics.median(values) if len(values) == len(runs) else None
+    return result
+
+
+def run_suite(specs: List[InstanceSpec], repeat: int = 1, verbose: bool = True, engine: str = "cp-sat") -> List[dict]:
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for i, spec in enumerate(specs, 1):
+        runs = []
+        for _ in range(repeat):
+            with ctx.Pool(1) as pool:
+                runs.append(pool.apply(run_instance, (spec.to_dict(), engine)))
+        result = _median_run(runs)
+        results.append(result)
+        if verbose:
+            print(f"[{i}/{len(specs)}] {result['name']}: {result['status']} "
+                  f"build={result['build_time']:.3f}s solve={result['solve_time']:.3f}s "
+                  f"mem={result['peak_memory_mb']:.0f}MiB", file=sys.stderr)
+    return results
+
+
+def compare(results: List[dict], baseline: List[dict], threshold: float = THRESHOLD) -> List[dict]:
+    """Regressions of `results` against `baseline`, matched by instance name. Status changes always count."""
+    previous = {r["name"]: r for r in baseline}
+    regressions = []
+    for r in results:
+        base = previous.get(r["name"])
+        if base is None:
+            continue
+        if r["status"] != base["status"]:
+            regressions.append({"name": r["name"], "metric": "status", "baseline": base["status"],
+                                "current": r["status"]})
+            continue
+        for metric in METRICS:
+            old, new = base.get(metric), r.get(metric)
+            if old is None or new is None:
+                # A time that existed in the baseline but not now (e.g. optimality no longer proven) regresses
+                if old is not None:
+                    regressions.append({"name": r["name"], "metric": metric, "baseline": old, "current": None})
+                continue
+            if new > old * threshold and new - old > MIN_DELTA[metric]:
+                regressions.append({"name": r["name"], "metric": metric, "baseline": old, "current": new,
+                                    "ratio": new / old if old else None})
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the workforce scheduling engine")
+    parser.add_argument("--suite", default="quick", choices=["quick", "full"])
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--timeout", type=float, default=10.0, help="Solver time limit per instance (seconds)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per instance; timings are the median")
+    parser.add_argument("--engine", default="cp-sat", choices=["cp-sat", "lns"],
+                        help="Monolithic CP-SAT model or large-neighbourhood search")
+    parser.add_argument("--out", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = run_suite(suite(args.suite, year=args.year, timeout_seconds=args.timeout), repeat=args.repeat,
+                        engine=args.engine)
+
+    regressions = []
+    if not args.update_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                regressions = compare(results, json.load(f)["results"], args.threshold)
+        else:
+            print(f"No baseline at {args.baseline}; run with --update-baseline to record one", file=sys.stderr)
+
+    report = {
+        "suite": args.suite,
+        "repeat": args.repeat,
+        "engine": args.engine,
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "results": results,
+        "regressions": regressions
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({**report, "regressions": []}, f, indent=2)
+
+    for reg in regressions:
+        print(f"REGRESSION {reg['name']} {reg['metric']}: {reg['baseline']} -> {reg['current']}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Union
+
+from models import ScheduleRequest, HorizonRequest
+
+# --- CONFIGURATION ---
+CACHE_SIZE = int(os.environ.get("SCHEDULER_CACHE_SIZE", 256))  # In-memory entries
+CACHE_DB = os.environ.get("SCHEDULER_CACHE_DB")  # Optional SQLite file for the on-disk tier
+CACHE_DB_MAX_BYTES = int(os.environ.get("SCHEDULER_CACHE_DB_MAX_BYTES", 256 * 1024 * 1024))
+
+# Bump when the engine changes in a way that makes old solutions stale
+CACHE_VERSION = 4
+
+# Solver statuses worth remembering. UNKNOWN just means "ran out of time" and a retry may do better.
+CACHEABLE_STATUSES = {"OPTIMAL", "FEASIBLE", "INFEASIBLE"}
+
+
+def canonical_key(request: Union[ScheduleRequest, HorizonRequest]) -> str:
+    """
+    Content hash of a request. Employees and constraints are sorted and deduplicated first,
+    so the same roster typed in a different order hits the same entry.
+    """
+    data = request.model_dump(mode="json")
+
+    employees = {json.dumps(e, sort_keys=True) for e in data["employees"]}
+    constraints = {json.dumps(c, sort_keys=True) for c in data["constraints"]}
+
+    canonical = {
+        "v": CACHE_VERSION,
+        "kind": type(request).__name__,
+        "employees": sorted(employees),
+        "constraints": sorted(constraints),
+        "config": data["config"],
+    }
+    # Anything else on the request (added later) is part of the key too
+    for field, value in data.items():
+        canonical.setdefault(field, value)
+
+    blob = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    """SQLite table of serialized responses, evicted least-recently-used once it grows past max_bytes."""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS solutions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM solutions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE solutions SET last_access = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        return row[0]
+
+    def put(self, key: str, value: str):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO solutions (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, value, len(value), time.time())
+        )
+        self._evict()
+        self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM solutions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM solutions ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM solutions WHERE key = ?", (key,))
+            total -= size
+
+
+class SolutionCache:
+    """
+    Two-tier cache of solved schedules: an in-memory LRU in front of an optional SQLite file.
+    Values are the response dicts exactly as the solver workers return them.
+    """
+
+    def __init__(self, max_entries: int = CACHE_SIZE, db_path: Optional[str] = CACHE_DB,
+                 max_disk_bytes: int = CACHE_DB_MAX_BYTES):
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._disk = _DiskTier(db_path, max_disk_bytes) if db_path else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            elif self._disk is not None:
+                value = self._disk.get(key)
+                if value is not None:
+                    self._remember(key, value)
+
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return json.loads(value)
+
+    def put(self, key: str, response: dict):
+        if response["metadata"]["status"] not in CACHEABLE_STATUSES:
+            return
+        value = json.dumps(response, separators=(",", ":"))
+        with self._lock:
+            self._remember(key, value)
+            if self._disk is not None:
+                self._disk.put(key, value)
+
+    def _remember(self, key: str, value: str):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
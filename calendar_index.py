@@ -0,0 +1,105 @@
+import calendar
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# Jewish holidays (Yom Tov, as observed in Israel) by Gregorian date. Like Shabbat, each one covers every shift of
+# the day plus the night shift of its eve. Offline table; extend it when planning beyond its last year.
+HOLIDAYS = {
+    "2024-04-23": "Pesach", "2024-04-29": "Shvi'i shel Pesach", "2024-06-12": "Shavuot", "2024-10-03": "Rosh Hashanah",
+    "2024-10-04": "Rosh Hashanah II", "2024-10-12": "Yom Kippur", "2024-10-17": "Sukkot", "2024-10-24": "Shemini Atzeret",
+    "2025-04-13": "Pesach", "2025-04-19": "Shvi'i shel Pesach", "2025-06-02": "Shavuot", "2025-09-23": "Rosh Hashanah",
+    "2025-09-24": "Rosh Hashanah II", "2025-10-02": "Yom Kippur", "2025-10-07": "Sukkot", "2025-10-14": "Shemini Atzeret",
+    "2026-04-02": "Pesach", "2026-04-08": "Shvi'i shel Pesach", "2026-05-22": "Shavuot", "2026-09-12": "Rosh Hashanah",
+    "2026-09-13": "Rosh Hashanah II", "2026-09-21": "Yom Kippur", "2026-09-26": "Sukkot", "2026-10-03": "Shemini Atzeret",
+    "2027-04-22": "Pesach", "2027-04-28": "Shvi'i shel Pesach", "2027-06-11": "Shavuot", "2027-10-02": "Rosh Hashanah",
+    "2027-10-03": "Rosh Hashanah II", "2027-10-11": "Yom Kippur", "2027-10-16": "Sukkot", "2027-10-23": "Shemini Atzeret",
+    "2028-04-11": "Pesach", "2028-04-17": "Shvi'i shel Pesach", "2028-05-31": "Shavuot", "2028-09-21": "Rosh Hashanah",
+    "2028-09-22": "Rosh Hashanah II", "2028-09-30": "Yom Kippur", "2028-10-05": "Sukkot", "2028-10-12": "Shemini Atzeret",
+    "2029-03-31": "Pesach", "2029-04-06": "Shvi'i shel Pesach", "2029-05-20": "Shavuot", "2029-09-10": "Rosh Hashanah",
+    "2029-09-11": "Rosh Hashanah II", "2029-09-19": "Yom Kippur", "2029-09-24": "Sukkot", "2029-10-01": "Shemini Atzeret",
+    "2030-04-18": "Pesach", "2030-04-24": "Shvi'i shel Pesach", "2030-06-07": "Shavuot", "2030-09-28": "Rosh Hashanah",
+    "2030-09-29": "Rosh Hashanah II", "2030-10-07": "Yom Kippur", "2030-10-12": "Sukkot", "2030-10-19": "Shemini Atzeret",
+    "2031-04-08": "Pesach", "2031-04-14": "Shvi'i shel Pesach", "2031-05-28": "Shavuot", "2031-09-18": "Rosh Hashanah",
+    "2031-09-19": "Rosh Hashanah II", "2031-09-27": "Yom Kippur", "2031-10-02": "Sukkot", "2031-10-09": "Shemini Atzeret",
+    "2032-03-27": "Pesach", "2032-04-02": "Shvi'i shel Pesach", "2032-05-16": "Shavuot", "2032-09-06": "Rosh Hashanah",
+    "2032-09-07": "Rosh Hashanah II", "2032-09-15": "Yom Kippur", "2032-09-20": "Sukkot", "2032-09-27": "Shemini Atzeret",
+    "2033-04-14": "Pesach", "2033-04-20": "Shvi'i shel Pesach", "2033-06-03": "Shavuot", "2033-09-24": "Rosh Hashanah",
+    "2033-09-25": "Rosh Hashanah II", "2033-10-03": "Yom Kippur", "2033-10-08": "Sukkot", "2033-10-15": "Shemini Atzeret",
+    "2034-04-04": "Pesach", "2034-04-10": "Shvi'i shel Pesach", "2034-05-24": "Shavuot", "2034-09-14": "Rosh Hashanah",
+    "2034-09-15": "Rosh Hashanah II", "2034-09-23": "Yom Kippur", "2034-09-28": "Sukkot", "2034-10-05": "Shemini Atzeret",
+    "2035-04-24": "Pesach", "2035-04-30": "Shvi'i shel Pesach", "2035-06-13": "Shavuot", "2035-10-04": "Rosh Hashanah",
+    "2035-10-05": "Rosh Hashanah II", "2035-10-13": "Yom Kippur", "2035-10-18": "Sukkot", "2035-10-25": "Shemini Atzeret",
+}
+HOLIDAY_DATES = {date.fromisoformat(d): name for d, name in HOLIDAYS.items()}
+
+
+class MonthIndex:
+    """
+    Weekday, Shabbat and holiday data of one month as read-only arrays indexed by day - 1.
+    Built once per (year, month) by month_index() and shared by the engine, the agent and the UI.
+    """
+
+    def __init__(self, year: int, month: int):
+        self.year = year
+        self.month = month
+        self.num_days = calendar.monthrange(year, month)[1]
+        self.dates = tuple(date(year, month, d) for d in range(1, self.num_days + 1))
+        self.weekdays = self._frozen([dt.weekday() for dt in self.dates])  # 0=Monday
+        self.day_names = [calendar.day_name[wd] for wd in self.weekdays.tolist()]
+        # Weekday -> days of the month, e.g. weekday_days[6] = every Sunday
+        self.weekday_days: Dict[int, List[int]] = {wd: (np.flatnonzero(self.weekdays == wd) + 1).tolist()
+                                                   for wd in range(7)}
+
+        # Shabbat runs from Friday night through Saturday; a holiday from the night before through the day itself
+        self.shabbat_eve = self._frozen(self.weekdays == 4)
+        self.shabbat_day = self._frozen(self.weekdays == 5)
+        self.holiday_day = self._frozen([dt in HOLIDAY_DATES for dt in self.dates])
+        self.holiday_eve = self._frozen([dt + timedelta(days=1) in HOLIDAY_DATES for dt in self.dates])
+        # Day of the month -> holiday name ("Erev ..." on the eve)
+        self.holidays: Dict[int, str] = {}
+        for d, dt in enumerate(self.dates, start=1):
+            if dt in HOLIDAY_DATES:
+                self.holidays[d] = HOLIDAY_DATES[dt]
+            elif dt + timedelta(days=1) in HOLIDAY_DATES:
+                self.holidays[d] = f"Erev {HOLIDAY_DATES[dt + timedelta(days=1)]}"
+
+    @staticmethod
+    def _frozen(values) -> np.ndarray:
+        array = np.asarray(values)
+        array.setflags(write=False)
+        return array
+
+
+@lru_cache(maxsize=None)
+def month_index(year: int, month: int) -> MonthIndex:
+    return MonthIndex(year, month)
+
+
+def day_flags(dates: Sequence[date]) -> Dict[str, np.ndarray]:
+    """
+    weekdays, shabbat_eve, shabbat_day, holiday_eve and holiday_day for consecutive `dates` that may span months
+    (rolling windows), assembled from the month indexes.
+    """
+    parts = {"weekdays": [], "shabbat_eve": [], "shabbat_day": [], "holiday_eve": [], "holiday_day": []}
+    pos = 0
+    while pos < len(dates):
+        idx = month_index(dates[pos].year, dates[pos].month)
+        first = dates[pos].day - 1
+        count = min(len(dates) - pos, idx.num_days - first)
+        for name, values in parts.items():
+            values.append(getattr(idx, name)[first:first + count])
+        pos += count
+    return {name: np.concatenate(values) if values else np.zeros(0, dtype=bool) for name, values in parts.items()}
+
+
+def slot_masks(flags: Dict[str, np.ndarray], is_night: np.ndarray):
+    """
+    (Shabbat mask, holiday mask) for the days in `flags` (see day_flags), each (days, shifts): every shift of the
+    day itself plus the night shifts of its eve.
+    """
+    shabbat = flags["shabbat_day"][:, None] | (flags["shabbat_eve"][:, None] & is_night[None, :])
+    holiday = flags["holiday_day"][:, None] | (flags["holiday_eve"][:, None] & is_night[None, :])
+    return shabbat, holiday
@@ -1,209 +1,767 @@
-import calendar
-from datetime import date
+import os
+import time
+import threading
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
 from ortools.sat.python import cp_model
+from ortools.sat import sat_parameters_pb2
 # Import models from the file above (assuming same directory for this snippet)
-from models import ScheduleRequest, ScheduleResponse, ShiftAssignment, EmployeeStats, SolverMetadata
+from models import (ScheduleRequest, ScheduleResponse, ShiftAssignment, EmployeeStats, SolverMetadata, SolverConfig,
+                    ConflictReason, DEFAULT_SHIFT_TYPES)
+from calendar_index import month_index, day_flags, slot_masks
+
+# Named CP-SAT parameter sets selectable through SolverConfig.profile
+SOLVER_PROFILES = {
+    # Stop at the first schedule that satisfies every hard rule
+    "fast-feasible": {"stop_after_first_solution": True, "linearization_level": 0, "cp_model_probing_level": 0},
+    # CP-SAT defaults
+    "balanced": {"linearization_level": 1},
+    # Stronger LP relaxation and probing: slower per node, but much better at closing the gap
+    "prove-optimal": {"linearization_level": 2, "cp_model_probing_level": 2},
+}
+
+# Rules guarded per employee when explaining an INFEASIBLE request: name -> message template
+EMPLOYEE_RULES = {
+    "max_shifts": "{name} may work at most {emp.max_shifts} shifts a month",
+    "min_shabbat": "{name} must work at least {emp.min_shabbat} Shabbat shifts a month",
+    "max_shabbat": "{name} may work at most {emp.max_shabbat} Shabbat shifts a month",
+    "min_holiday": "{name} must work at least {emp.min_holiday} holiday shifts a month",
+    "max_holiday": "{name} may work at most {emp.max_holiday} holiday shifts a month",
+    "one_shift_per_day": "{name} may work at most one shift a day",
+    "consecutive_shifts": "{name} may work the same shift at most 2 times in 3 days",
+    "consecutive_days": "{name} may work at most 3 days in 4",
+    "rest": "{name} may not work a day shift right after a night shift",
+    "shabbat_night_only": "{name} may only work Saturday night among the Shabbat shifts",
+}
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS / Windows
+        return os.cpu_count() or 1
+
+
+def solve_cores(concurrent_solves: int = 1) -> int:
+    """Cores one solve may use while `concurrent_solves` of them run side by side."""
+    return max(1, available_cores() // max(1, concurrent_solves))
+
+
+def solver_parameters(config: SolverConfig, concurrent_solves: int = 1) -> dict:
+    """
+    Resolves profile + overrides into the final SatParameters values.
+    Unless num_workers is given, the free cores are split between the solves running at the same time.
+    """
+    params = dict(SOLVER_PROFILES[config.profile])
+    params["max_time_in_seconds"] = config.timeout_seconds
+    params["num_workers"] = config.num_workers or solve_cores(concurrent_solves)
+    if config.random_seed is not None:
+        params["random_seed"] = config.random_seed
+    if config.relative_gap is not None:
+        params["relative_gap_limit"] = config.relative_gap
+    if config.absolute_gap is not None:
+        params["absolute_gap_limit"] = config.absolute_gap
+    params.update(config.parameters)
+    return params
+
+
+def relative_gap(objective: float, bound: Optional[float]) -> Optional[float]:
+    """CP-SAT's relative gap: |objective - bound| / max(1, |objective|)."""
+    if bound is None:
+        return None
+    return abs(objective - bound) / max(1.0, abs(objective))
 
 
 class WorkforceSchedulerEngine:
-    def __init__(self, request: ScheduleRequest):
+    # Longest rule window is 4 days, so 3 days of history decide every rule crossing the window start
+    HISTORY_DAYS = 3
+
+    def __init__(self, request: ScheduleRequest, concurrent_solves: int = 1, dates: Optional[List[date]] = None,
+                 explaining: bool = False):
+        """
+        `dates` overrides the solve window (consecutive days, default: the request's month). The rolling
+        horizon uses it to solve a slice of a longer range; request.history then holds everything committed so far.
+        `explaining` builds the model for explain() instead: every rule is guarded by an assumption literal.
+        """
         self.req = request
-        self.num_days = calendar.monthrange(request.year, request.month)[1]
+        self.concurrent_solves = concurrent_solves
+        self.explaining = explaining
+        self.assumptions: Dict[tuple, cp_model.IntVar] = {}  # Rule key -> guarding literal (explaining only)
+        self.explain_time = 0.0
+        self.symmetry_classes: List[List[int]] = []  # Interchangeable employees, see _interchangeable_classes
+        self.stalled = False  # Set when stall_seconds ended the search
+        self.stopped = False  # Set by stop()
+        self.parameters = solver_parameters(request.config, concurrent_solves)
+        if dates is None:
+            dates = month_index(request.year, request.month).dates
+        self.dates = dates
+        self.num_days = len(dates)
+        self.day_index = {dt: i for i, dt in enumerate(dates)}
+        self.flags = day_flags(dates)  # weekdays (0=Monday), Shabbat / holiday days and eves; index = day - 1
+        self.shift_types = request.shift_types or DEFAULT_SHIFT_TYPES
+        self.num_shifts = len(self.shift_types)
+        self.is_night = np.array([st.is_night for st in self.shift_types], dtype=bool)
         self.model = cp_model.CpModel()
         self.solver = cp_model.CpSolver()
-        self.shifts = {}  # Decision variables
+        self.x = None  # Decision variables, see _build_variables
         self.employee_map = {e.name: i for i, e in enumerate(request.employees)}
-        self.shabbat_indices = self._calculate_shabbat_indices()
-
-    def _calculate_shabbat_indices(self):
-        shabbat_shifts = []
-        for day in range(1, self.num_days + 1):
-            weekday = date(self.req.year, self.req.month, day).weekday()
-            # 4=Friday, 5=Saturday
-            if weekday == 4:
-                shabbat_shifts.append((day, 1))  # Fri Night
-            elif weekday == 5:
-                shabbat_shifts.append((day, 0))  # Sat Morn
-                shabbat_shifts.append((day, 1))  # Sat Night
-        return shabbat_shifts
-
-    def solve(self) -> ScheduleResponse:
-        self._build_variables()
-        self._add_hard_constraints()
-        self._add_dynamic_constraints()
-        self._add_objectives()
+        self.shabbat_mask, self.holiday_mask = slot_masks(self.flags, self.is_night)  # (days, shifts)
+        self.history = self._map_history()
+        self.segments = self._month_segments()
+        self.previous = self._map_previous_schedule()
+
+    def _assignment_date(self, a: ShiftAssignment, year: int, month: int) -> Optional[date]:
+        if a.date is not None:
+            return a.date
+        if not 1 <= a.day <= month_index(year, month).num_days:
+            return None
+        return date(year, month, a.day)
+
+    def _assignment_cells(self, a: ShiftAssignment):
+        # (shift index, employee index) pairs of a published day, read from `shifts` when present
+        cells = []
+        if a.shifts is not None:
+            for s, st in enumerate(self.shift_types):
+                cells += [(s, self.employee_map[n]) for n in a.shifts.get(st.name, []) if n in self.employee_map]
+            return cells
+        day_slots = np.flatnonzero(~self.is_night)
+        night_slots = np.flatnonzero(self.is_night)
+        for slots, name in ((day_slots, a.morning_employee), (night_slots, a.night_employee)):
+            if len(slots) and name in self.employee_map:
+                cells.append((int(slots[0]), self.employee_map[name]))
+        return cells
+
+    def _map_history(self):
+        # Fixed assignments before the window: date -> [(shift, employee index), ...]
+        prev_year, prev_month = (self.req.year, self.req.month - 1) if self.req.month > 1 else (self.req.year - 1, 12)
+        history = {}
+        for a in self.req.history or []:
+            dt = self._assignment_date(a, prev_year, prev_month)
+            if dt is None or dt >= self.dates[0]:
+                continue
+            history[dt] = self._assignment_cells(a)
+        return history
+
+    def _history_tail(self) -> np.ndarray:
+        # (HISTORY_DAYS, shifts, employees) of 0/1 for the days right before the window, oldest first
+        tail = np.zeros((self.HISTORY_DAYS, self.num_shifts, len(self.req.employees)), dtype=int)
+        for i in range(self.HISTORY_DAYS):
+            day = self.dates[0] - timedelta(days=self.HISTORY_DAYS - i)
+            for s, e_idx in self.history.get(day, []):
+                tail[i, s, e_idx] = 1
+        return tail
+
+    def _month_segments(self):
+        """
+        Splits the window by calendar month. Monthly quotas apply per segment, net of what the history already
+        committed in that month. Minimums are scaled by the share of the month that is known (history + window),
+        so a window ending mid-month, or a horizon starting mid-month, is not asked for a whole month's quota.
+        """
+        num_emp = len(self.req.employees)
+        segments = []
+        for d, dt in enumerate(self.dates):
+            if not segments or (segments[-1]["year"], segments[-1]["month"]) != (dt.year, dt.month):
+                segments.append({"year": dt.year, "month": dt.month, "days": []})
+            segments[-1]["days"].append(d)
+
+        for seg in segments:
+            month_days = month_index(seg["year"], seg["month"]).num_days
+            first_known = self.dates[seg["days"][0]].day
+            carry = np.zeros((4, num_emp), dtype=int)  # day shifts, night shifts, shabbat, holiday
+            shabbat, holiday = slot_masks(day_flags(month_index(seg["year"], seg["month"]).dates), self.is_night)
+            for dt, cells in self.history.items():
+                if (dt.year, dt.month) != (seg["year"], seg["month"]):
+                    continue
+                first_known = min(first_known, dt.day)
+                for s, e_idx in cells:
+                    carry[int(self.is_night[s]), e_idx] += 1
+                    carry[2, e_idx] += shabbat[dt.day - 1, s]
+                    carry[3, e_idx] += holiday[dt.day - 1, s]
+            seg["carry"] = carry
+            seg["closes_month"] = self.dates[seg["days"][-1]].day == month_days
+            seg["share"] = (self.dates[seg["days"][-1]].day - first_known + 1) / month_days
+        return segments
+
+    def _map_previous_schedule(self):
+        # {(day index, shift, employee index)} of the previous schedule, for warm starts
+        previous = set()
+        for a in self.req.previous_schedule or []:
+            d = self.day_index.get(self._assignment_date(a, self.req.year, self.req.month))
+            if d is None:
+                continue
+            previous.update((d, s, e_idx) for s, e_idx in self._assignment_cells(a))
+        return previous
+
+    def solve(self, on_solution: Optional[Callable[[cp_model.CpSolverSolutionCallback], None]] = None
+              ) -> ScheduleResponse:
+        """`on_solution` is called from CP-SAT's callback on every improving solution (benchmarks, streaming)."""
+        self.build()
 
         # Configure Solver
-        self.solver.parameters.max_time_in_seconds = self.req.config.timeout_seconds
-        status_val = self.solver.Solve(self.model)
+        self._apply_parameters()
+        monitor = _SearchMonitor(on_solution)
+        done = threading.Event()
+        watcher = None
+        if self.req.config.stall_seconds is not None:
+            watcher = threading.Thread(target=self._watch_stall, args=(monitor, done), daemon=True)
+            watcher.start()
+        try:
+            status_val = self.solver.Solve(self.model, monitor)
+        finally:
+            done.set()
+            if watcher is not None:
+                watcher.join()
         status_name = self.solver.StatusName(status_val)
 
         # Logic to map raw solver data to Output Models
         if status_val in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
-            return self._serialize_solution(status_name)
+            result = self._serialize_solution(status_name, self.solver.ResponseProto())
         else:
+            explanation = None
+            if status_val == cp_model.INFEASIBLE and self.req.config.explain_infeasible:
+                explanation = self.explain()
             # Return empty structure with failure status
-            return ScheduleResponse(
-                metadata=SolverMetadata(status=status_name, objective_value=0.0, wall_time=self.solver.WallTime()),
+            result = ScheduleResponse(
+                metadata=self._metadata(status_name, self.solver.ResponseProto(), objective_value=0.0),
                 schedule=[],
-                statistics={}
+                statistics={},
+                explanation=explanation
             )
 
-    def _build_variables(self):
-        for d in range(1, self.num_days + 1):
-            for s in range(2):
-                for e_idx in range(len(self.req.employees)):
-                    self.shifts[(d, s, e_idx)] = self.model.NewBoolVar(f'd{d}_s{s}_e{e_idx}')
+        meta = result.metadata
+        if meta.status == "OPTIMAL" and meta.gap:
+            # CP-SAT reports OPTIMAL once a gap limit is met; only a closed gap is optimal here
+            meta.status = "FEASIBLE"
+            meta.stop_reason = "gap"
+        else:
+            meta.stop_reason = self._stop_reason(meta.status)
+        meta.first_solution_time = monitor.first_solution_time
+        meta.objective_trace = monitor.trace
+        return result
 
-    def _add_hard_constraints(self):
-        num_emp = len(self.req.employees)
+    def _stop_reason(self, status: str) -> str:
+        if status == "OPTIMAL":
+            return "optimal"
+        if status == "INFEASIBLE":
+            return "infeasible"
+        if self.stalled:
+            return "stall"
+        if self.stopped:
+            return "stopped"
+        if status == "FEASIBLE" and self.parameters.get("stop_after_first_solution"):
+            return "first_solution"
+        return "time_limit"
+
+    def _watch_stall(self, monitor: "_SearchMonitor", done: threading.Event):
+        # Ends the search once the best schedule has not improved for stall_seconds (never before the first one)
+        stall = self.req.config.stall_seconds
+        while not done.wait(min(0.1, stall / 4)):
+            last = monitor.last_improvement
+            if last is not None and time.monotonic() - last >= stall:
+                self.stalled = True
+                self.solver.StopSearch()
+                return
+
+    def build(self):
+        """Builds the CP model (variables, hard rules, weighted objective, hints) without solving it."""
+        build_start = time.perf_counter()
+        self._compute_eligibility()
+        self._build_variables()
+        self._add_hard_constraints()
+        self.symmetry_classes = self._interchangeable_classes()
+        if self.req.config.symmetry_breaking == "lex":
+            self._add_symmetry_breaking()
+        self._add_objectives()
+        self._add_solution_hints()
+        self.num_constraints = len(self.model.Proto().constraints)
+        self.build_time = time.perf_counter() - build_start
+
+    def explain(self) -> List[ConflictReason]:
+        """
+        Names a small set of rules that cannot all hold, from one extra solve. The model is rebuilt with every
+        unavailability entry, every shift's coverage and each employee's quotas and rules behind its own
+        assumption literal; CP-SAT then reports a subset of those assumptions that is infeasible on its own.
+        Returns an empty list when the request is feasible after all, or the search ran out of time.
+        """
+        start = time.perf_counter()
+        engine = WorkforceSchedulerEngine(self.req, self.concurrent_solves, dates=self.dates, explaining=True)
+        engine._compute_eligibility()
+        engine._build_variables()
+        engine._add_hard_constraints()
+        engine._add_forbidden_cells()
+        engine.model.AddAssumptions(list(engine.assumptions.values()))
+
+        # The conflicting subset is only reported by a single search worker
+        engine.parameters = {**self.parameters, "num_workers": 1}
+        engine._apply_parameters()
+        status_val = engine.solver.Solve(engine.model)
+
+        conflict = []
+        if status_val == cp_model.INFEASIBLE:
+            keys = {var.Index(): key for key, var in engine.assumptions.items()}
+            conflict = [engine._describe(keys[i]) for i in engine.solver.SufficientAssumptionsForInfeasibility()]
+        self.explain_time = time.perf_counter() - start
+        return conflict
+
+    def _assumption(self, key: tuple) -> cp_model.IntVar:
+        if key not in self.assumptions:
+            self.assumptions[key] = self.model.NewBoolVar("assume_" + "_".join(map(str, key)))
+        return self.assumptions[key]
+
+    def _describe(self, key: tuple) -> ConflictReason:
+        rule = key[0]
+        if rule == "unavailability":
+            c = self.req.constraints[key[1]]
+            dt = c.date or date(self.req.year, self.req.month, c.day)
+            shift = self.shift_types[c.shift].name if c.shift is not None else None
+            return ConflictReason(rule=rule, employee=c.employee_name, date=dt, shift=shift, constraint_index=key[1],
+                                  message=f"{c.employee_name} is unavailable on {dt}" + (f" ({shift})" if shift else ""))
+        if rule == "coverage":
+            st, dt = self.shift_types[key[2]], self.dates[key[1]]
+            return ConflictReason(rule=rule, date=dt, shift=st.name,
+                                  message=f"The {st.name} shift on {dt} needs {st.headcount} employee(s)")
+        emp = self.req.employees[key[1]]
+        return ConflictReason(rule=rule, employee=emp.name, message=EMPLOYEE_RULES[rule].format(name=emp.name, emp=emp))
+
+    def _add(self, constraint, key: tuple):
+        # A hard constraint; when explaining, it only holds while its rule's assumption does
+        ct = self.model.Add(constraint)
+        if self.explaining:
+            ct.OnlyEnforceIf(self._assumption(key))
+
+    def _add_at_most_one(self, variables: list, key: tuple):
+        if self.explaining:  # AtMostOne takes no enforcement literal
+            self._add(cp_model.LinearExpr.Sum(variables) <= 1, key)
+        else:
+            self.model.AddAtMostOne(variables)
+
+    def _add_exactly_one(self, variables: list, key: tuple):
+        if self.explaining:
+            self._add(cp_model.LinearExpr.Sum(variables) == 1, key)
+        else:
+            self.model.AddExactlyOne(variables)
+
+    def stream(self, on_solution: Callable[[ScheduleResponse], None]) -> ScheduleResponse:
+        """
+        Like solve(), but hands every improving solution to `on_solution` as soon as CP-SAT finds it
+        (status FEASIBLE, with the bound and elapsed time at that moment). Returns the final response.
+        """
+        return self.solve(lambda monitor: on_solution(self._serialize_solution("FEASIBLE", monitor.Response())))
+
+    def stop(self):
+        """Ends a running search early; solve() then returns the best schedule found so far. Thread-safe."""
+        self.stopped = True
+        self.solver.StopSearch()
+
+    def _metadata(self, status: str, response, objective_value: float, serialize_time: float = 0.0) -> SolverMetadata:
+        # Phase timings plus CP-SAT search statistics, so a slow solve shows whether Python or the search was slow
+        bound = response.best_objective_bound if status in ["OPTIMAL", "FEASIBLE"] else None
+        return SolverMetadata(
+            status=status,
+            objective_value=objective_value,
+            wall_time=response.wall_time,
+            build_time=self.build_time,
+            serialize_time=serialize_time,
+            parameters=self.parameters,
+            conflicts=response.num_conflicts,
+            branches=response.num_branches,
+            num_booleans=response.num_booleans,
+            num_constraints=self.num_constraints,
+            best_bound=bound,
+            gap=relative_gap(objective_value, bound),
+            explain_time=self.explain_time,
+            interchangeable_employees=sum(len(members) for members in self.symmetry_classes)
+        )
+
+    def _apply_parameters(self, solver: Optional[cp_model.CpSolver] = None, parameters: Optional[dict] = None):
+        # Defaults to this engine's own solver and parameters
+        solver = solver or self.solver
+        known = sat_parameters_pb2.SatParameters.DESCRIPTOR.fields_by_name
+        for name, value in (parameters or self.parameters).items():
+            if name not in known:
+                raise ValueError(f"Unknown CP-SAT parameter: {name}")
+            enum = known[name].enum_type
+            if enum is not None:
+                # Enums come by name or number; the solver's parameters only take their own enum members
+                label = value if isinstance(value, str) else enum.values_by_number[value].name
+                value = getattr(solver.parameters, label)
+            setattr(solver.parameters, name, value)
 
-        # 1. One employee per shift
-        for d in range(1, self.num_days + 1):
-            for s in range(2):
-                self.model.Add(sum(self.shifts[(d, s, e)] for e in range(num_emp)) == 1)
-
-        # 2. Max one shift per day
-        for e in range(num_emp):
-            for d in range(1, self.num_days + 1):
-                self.model.Add(sum(self.shifts[(d, s, e)] for s in range(2)) <= 1)
-
-        # 3. Consecutive constraints (2 Mornings, 2 Nights, 3 Days)
-        for e in range(num_emp):
-            # Mornings
-            for d in range(1, self.num_days - 1):
-                self.model.Add(sum(self.shifts[(d + i, 0, e)] for i in range(3)) <= 2)
-            # Nights
-            for d in range(1, self.num_days - 1):
-                self.model.Add(sum(self.shifts[(d + i, 1, e)] for i in range(3)) <= 2)
-            # Working days
-            is_working = {d: self.model.NewBoolVar(f'w_{d}_{e}') for d in range(1, self.num_days + 1)}
-            for d in range(1, self.num_days + 1):
-                self.model.Add(sum(self.shifts[(d, s, e)] for s in range(2)) == is_working[d])
-            for d in range(1, self.num_days - 2):
-                self.model.Add(sum(is_working[d + i] for i in range(4)) <= 3)
-
-        # 4. Monthly Limits & Shabbat
-        for e_idx, emp in enumerate(self.req.employees):
-            # Total
-            all_shifts = [self.shifts[(d, s, e_idx)] for d in range(1, self.num_days + 1) for s in range(2)]
-            self.model.Add(sum(all_shifts) <= emp.max_shifts)
-
-            # Shabbat
-            shabbat_vars = [self.shifts[(d, s, e_idx)] for (d, s) in self.shabbat_indices]
-            self.model.Add(sum(shabbat_vars) >= emp.min_shabbat)
-            self.model.Add(sum(shabbat_vars) <= emp.max_shabbat)
-
-            # Shabbat Night Only Logic
-            if emp.shabbat_night_only:
-                for (d, s) in self.shabbat_indices:
-                    # If it's NOT Sat Night (i.e., Fri Night or Sat Morn), forbid it
-                    weekday = date(self.req.year, self.req.month, d).weekday()
-                    is_sat_night = (weekday == 5 and s == 1)
-                    if not is_sat_night:
-                        self.model.Add(self.shifts[(d, s, e_idx)] == 0)
-        # --- ADD THIS NEW BLOCK ---
-        # 5. REST CONSTRAINT: No Morning Shift after a Night Shift
-        # Logic: If Employee works Day(d-1) Night, they CANNOT work Day(d) Morning.
-        for e in range(num_emp):
-            for d in range(2, self.num_days + 1):
-                # Sum of (Yesterday Night) + (Today Morning) <= 1
-                # If Yesterday Night is 1, Today Morning MUST be 0.
-                self.model.Add(
-                    self.shifts[(d - 1, 1, e)] + self.shifts[(d, 0, e)] <= 1
-                )
-    def _add_dynamic_constraints(self):
-        for c in self.req.constraints:
-            if c.employee_name in self.employee_map and 1 <= c.day <= self.num_days:
+    def _compute_eligibility(self):
+        """
+        eligible[day, shift, employee] is False wherever a rule already forbids the assignment. Those cells never
+        get a variable, instead of getting one plus an `== 0` constraint.
+        When explaining, the cells stay eligible and _add_forbidden_cells() adds the guarded `== 0` constraints.
+        """
+        eligible = np.ones((self.num_days, self.num_shifts, len(self.req.employees)), dtype=bool)
+        forbidden = []  # (rule key, grid index) of every ruled-out cell or group of cells
+
+        # Unavailability
+        month_days = month_index(self.req.year, self.req.month).num_days
+        for i, c in enumerate(self.req.constraints):
+            if c.date is None and not 1 <= c.day <= month_days:
+                continue
+            d = self.day_index.get(c.date or date(self.req.year, self.req.month, c.day))
+            if c.employee_name in self.employee_map and d is not None:
                 e_idx = self.employee_map[c.employee_name]
                 if c.shift is None:
-                    self.model.Add(self.shifts[(c.day, 0, e_idx)] == 0)
-                    self.model.Add(self.shifts[(c.day, 1, e_idx)] == 0)
-                elif c.shift in [0, 1]:
-                    self.model.Add(self.shifts[(c.day, c.shift, e_idx)] == 0)
+                    forbidden.append((("unavailability", i), (d, slice(None), e_idx)))
+                elif 0 <= c.shift < self.num_shifts:
+                    forbidden.append((("unavailability", i), (d, c.shift, e_idx)))
+
+        # Shabbat Night Only: of the Shabbat slots, only Saturday night shifts are allowed
+        night_only = [e for e, emp in enumerate(self.req.employees) if emp.shabbat_night_only]
+        saturday_night = self.flags["shabbat_day"][:, None] & self.is_night[None, :]
+        for d, s in zip(*(i.tolist() for i in np.nonzero(self.shabbat_mask & ~saturday_night))):
+            forbidden += [(("shabbat_night_only", e), (d, s, e)) for e in night_only]
+
+        # Rest across the window start: a night shift on the last history day rules out a day shift on the first day
+        self.history_tail = self._history_tail()
+        rested = self.history_tail[-1, self.is_night, :].any(axis=0)
+        forbidden += [(("rest", e), (0, ~self.is_night, e)) for e in np.flatnonzero(rested).tolist()]
+
+        if not self.explaining:
+            for _, index in forbidden:
+                eligible[index] = False
+        self.forbidden = forbidden
+        self.eligible = eligible
+
+    def _add_forbidden_cells(self):
+        # Explaining only: the cells _compute_eligibility() left in place, each group behind its rule's assumption
+        for key, index in self.forbidden:
+            self._add(cp_model.LinearExpr.Sum(np.atleast_1d(self.x[index]).tolist()) == 0, key)
+
+    def _build_variables(self):
+        # Grid x[day - 1, shift, employee] holding a variable for eligible cells only (None elsewhere)
+        self.x = np.full(self.eligible.shape, None, dtype=object)
+        self.x_index = np.full(self.eligible.shape, -1, dtype=np.int64)  # Model variable indices
+        for d, s, e in zip(*(i.tolist() for i in np.nonzero(self.eligible))):
+            var = self.model.NewBoolVar(f'd{d + 1}_s{s}_e{e}')
+            self.x[d, s, e] = var
+            self.x_index[d, s, e] = var.Index()
+
+        # Per employee, the eligible cells in day-major order: parallel (days, shifts) arrays + variables
+        self.cells = []
+        for e in range(len(self.req.employees)):
+            days, shifts = np.nonzero(self.eligible[:, :, e])
+            self.cells.append((days, shifts, self.x[days, shifts, e].tolist()))
+
+    def _windows(self, positions: np.ndarray, size: int, limit: int) -> list:
+        """
+        (lo, hi) slices into a day-sorted cell list, one per `size`-day window that holds more than `limit`
+        cells. Windows with fewer cells cannot break the limit and are skipped; identical slices are merged.
+        """
+        starts = np.arange(max(0, self.num_days - size + 1))
+        lo = np.searchsorted(positions, starts)
+        hi = np.searchsorted(positions, starts + size)
+        keep = (hi - lo) > limit
+        return sorted(set(zip(lo[keep].tolist(), hi[keep].tolist())))
+
+    def _add_window_rule(self, positions: np.ndarray, variables: list, fixed: np.ndarray, size: int, limit: int,
+                         key: tuple):
+        # At most `limit` of `variables` in any `size` consecutive days; `fixed` counts the history days before
+        for lo, hi in self._windows(positions, size, limit):
+            self._add(cp_model.LinearExpr.Sum(variables[lo:hi]) <= limit, key)
+        # Windows that start in the history: the fixed days use up part of the limit
+        for k in range(1, size):
+            used = int(fixed[-k:].sum())
+            hi = int(np.searchsorted(positions, size - k))
+            if used and hi > limit - used:
+                self._add(cp_model.LinearExpr.Sum(variables[:hi]) <= limit - used, key)
+
+    def _add_hard_constraints(self):
+        Sum = cp_model.LinearExpr.Sum
+        tail = self.history_tail
+
+        # 1. Required headcount on every shift
+        for d in range(self.num_days):
+            for s, st in enumerate(self.shift_types):
+                staff = self.x[d, s, self.eligible[d, s]].tolist()
+                if st.headcount == 1:
+                    self._add_exactly_one(staff, ("coverage", d, s))
+                else:
+                    self._add(Sum(staff) == st.headcount, ("coverage", d, s))
+
+        for e, (days, shifts, variables) in enumerate(self.cells):
+            # 2. Max one shift per day
+            bounds = np.searchsorted(days, np.arange(self.num_days + 1)).tolist()
+            for d in range(self.num_days):
+                if bounds[d + 1] - bounds[d] > 1:
+                    self._add_at_most_one(variables[bounds[d]:bounds[d + 1]], ("one_shift_per_day", e))
+
+            # 3. Consecutive constraints (at most 2 of the same shift in 3 days, at most 3 working days in 4)
+            for s in range(self.num_shifts):
+                mask = shifts == s
+                self._add_window_rule(days[mask], [v for v, m in zip(variables, mask) if m], tail[:, s, e], 3, 2,
+                                      ("consecutive_shifts", e))
+            # At most one shift per day, so the shifts in a window count the days worked
+            self._add_window_rule(days, variables, tail[:, :, e].sum(axis=1), 4, 3, ("consecutive_days", e))
+
+            # 5. REST CONSTRAINT: No day shift after a night shift
+            night = self.is_night[shifts]
+            for d in range(1, self.num_days):
+                prev_nights = [variables[i] for i in range(bounds[d - 1], bounds[d]) if night[i]]
+                day_shifts = [variables[i] for i in range(bounds[d], bounds[d + 1]) if not night[i]]
+                if prev_nights and day_shifts:
+                    self._add_at_most_one(prev_nights + day_shifts, ("rest", e))
+
+        # 4. Monthly Limits, Shabbat & Holidays (per calendar month in the window, net of history)
+        for seg in self.segments:
+            first, last = seg["days"][0], seg["days"][-1]
+            carry_total = (seg["carry"][0] + seg["carry"][1]).tolist()
+            carry_shabbat = seg["carry"][2].tolist()
+            carry_holiday = seg["carry"][3].tolist()
+            for e_idx, emp in enumerate(self.req.employees):
+                days, shifts, variables = self.cells[e_idx]
+                lo, hi = np.searchsorted(days, [first, last + 1]).tolist()
+
+                # Total
+                max_left = emp.max_shifts - carry_total[e_idx]
+                if hi - lo > max_left:
+                    self._add(Sum(variables[lo:hi]) <= max_left, ("max_shifts", e_idx))
+
+                # Shabbat
+                in_shabbat = self.shabbat_mask[days[lo:hi], shifts[lo:hi]]
+                shabbat_vars = [v for v, m in zip(variables[lo:hi], in_shabbat) if m]
+                if seg["closes_month"]:
+                    min_shabbat = emp.min_shabbat if seg["share"] == 1 else int(emp.min_shabbat * seg["share"])
+                    if min_shabbat - carry_shabbat[e_idx] > 0:
+                        self._add(Sum(shabbat_vars) >= min_shabbat - carry_shabbat[e_idx], ("min_shabbat", e_idx))
+                max_shabbat_left = emp.max_shabbat - carry_shabbat[e_idx]
+                if len(shabbat_vars) > max_shabbat_left:
+                    self._add(Sum(shabbat_vars) <= max_shabbat_left, ("max_shabbat", e_idx))
+
+                # Holidays (same rules as Shabbat; slots that are both count towards both)
+                in_holiday = self.holiday_mask[days[lo:hi], shifts[lo:hi]]
+                holiday_vars = [v for v, m in zip(variables[lo:hi], in_holiday) if m]
+                if seg["closes_month"]:
+                    min_holiday = emp.min_holiday if seg["share"] == 1 else int(emp.min_holiday * seg["share"])
+                    if min_holiday - carry_holiday[e_idx] > 0:
+                        self._add(Sum(holiday_vars) >= min_holiday - carry_holiday[e_idx], ("min_holiday", e_idx))
+                if emp.max_holiday is not None and len(holiday_vars) > emp.max_holiday - carry_holiday[e_idx]:
+                    self._add(Sum(holiday_vars) <= emp.max_holiday - carry_holiday[e_idx], ("max_holiday", e_idx))
+
+    def _interchangeable_classes(self) -> List[List[int]]:
+        """
+        Groups of two or more employees that every rule and the objective treat alike: the same EmployeeConfig
+        apart from the name, the same eligible cells once unavailability is applied, and the same history,
+        monthly carry-over and previous-schedule cells. Swapping the shifts of two of them maps any schedule to
+        another one of the same cost.
+        """
+        previous = {}
+        for d, s, e in self.previous:
+            previous.setdefault(e, set()).add((d, s))
+        groups: Dict[tuple, List[int]] = {}
+        for e, emp in enumerate(self.req.employees):
+            signature = (
+                tuple(sorted(emp.model_dump(exclude={"name"}).items())),
+                self.eligible[:, :, e].tobytes(),
+                self.history_tail[:, :, e].tobytes(),
+                tuple(seg["carry"][:, e].tobytes() for seg in self.segments),
+                frozenset(previous.get(e, ())),
+            )
+            groups.setdefault(signature, []).append(e)
+        return [members for members in groups.values() if len(members) > 1]
+
+    def _add_symmetry_breaking(self):
+        """
+        Within each class of interchangeable employees, orders their assignment vectors lexicographically
+        (first member >= second >= ...), so of all the schedules that only permute them one stays feasible.
+        Opt-in: the constraints make the model asymmetric, which turns off CP-SAT's own (usually stronger)
+        symmetry reasoning in presolve.
+        """
+        for members in self.symmetry_classes:
+            for a, b in zip(members, members[1:]):
+                # Same eligible cells, so both variable lists line up cell for cell (day-major)
+                self._add_lex_greater_equal(self.cells[a][2], self.cells[b][2])
+
+    def _add_lex_greater_equal(self, upper: list, lower: list):
+        # `equal` is 1 exactly while the vectors agree on every cell so far (None: the empty prefix), and only
+        # then must upper >= lower hold on the next cell. After the first cell where upper > lower it stays 0
+        # and the remaining cells are free.
+        equal = None
+        for i, (u, l) in enumerate(zip(upper, lower)):
+            following = self.model.NewBoolVar(f'lex_{u.Index()}_{l.Index()}') if i < len(upper) - 1 else None
+            if equal is None:
+                self.model.Add(u >= l)
+                if following is not None:
+                    self.model.Add(following == 1 - u + l)
+            else:
+                self.model.Add(u >= l).OnlyEnforceIf(equal)
+                if following is not None:
+                    self.model.Add(following == 1 - u + l).OnlyEnforceIf(equal)
+                    self.model.Add(following == 0).OnlyEnforceIf(equal.Not())
+            equal = following
 
     def _add_objectives(self):
         # We need vars for stats to optimize them
         deficits = []
         imbalances = []
 
-        for e_idx, emp in enumerate(self.req.employees):
-            # Deficit
-            total_shifts = sum(self.shifts[(d, s, e_idx)] for d in range(1, self.num_days + 1) for s in range(2))
-            deficit = self.model.NewIntVar(0, 50, f'def_{e_idx}')
-            # Max(0, min_shifts - total)
-            self.model.Add(deficit >= emp.min_shifts - total_shifts)
-            deficits.append(deficit)
-
-            # Imbalance
-            m_count = sum(self.shifts[(d, 0, e_idx)] for d in range(1, self.num_days + 1))
-            n_count = sum(self.shifts[(d, 1, e_idx)] for d in range(1, self.num_days + 1))
-            diff = self.model.NewIntVar(0, 50, f'diff_{e_idx}')
-            self.model.Add(diff >= m_count - n_count)
-            self.model.Add(diff >= n_count - m_count)
-            imbalances.append(diff)
-
-        # Configurable weights
-        w_def = self.req.config.weight_deficit
-        w_bal = self.req.config.weight_balance
-        self.model.Minimize(sum(deficits) * w_def + sum(imbalances) * w_bal)
-
-    def _serialize_solution(self, status: str) -> ScheduleResponse:
-        schedule_list = []
-        stats = {e.name: {"total": 0, "m": 0, "n": 0, "s": 0} for e in self.req.employees}
+        for seg in self.segments:
+            first, last = seg["days"][0], seg["days"][-1]
+            carry_m, carry_n = seg["carry"][0].tolist(), seg["carry"][1].tolist()
+            for e_idx, emp in enumerate(self.req.employees):
+                days, shifts, variables = self.cells[e_idx]
+                lo, hi = np.searchsorted(days, [first, last + 1]).tolist()
+                night = self.is_night[shifts[lo:hi]]
 
-        # Build Schedule List
-        for d in range(1, self.num_days + 1):
-            m_emp, n_emp = None, None
+                # Deficit (a partial month aims for its pro-rated share of min_shifts)
+                target = emp.min_shifts if seg["share"] == 1 else round(emp.min_shifts * seg["share"])
+                total_shifts = cp_model.LinearExpr.Sum(variables[lo:hi])
+                deficit = self.model.NewIntVar(0, 50, f'def_{e_idx}')
+                # Max(0, min_shifts - total)
+                self.model.Add(deficit >= target - carry_m[e_idx] - carry_n[e_idx] - total_shifts)
+                deficits.append(deficit)
 
-            # Find who worked
-            for e_idx, emp in enumerate(self.req.employees):
-                if self.solver.Value(self.shifts[(d, 0, e_idx)]):
-                    m_emp = emp.name
-                    stats[emp.name]["total"] += 1
-                    stats[emp.name]["m"] += 1
-                    if (d, 0) in self.shabbat_indices: stats[emp.name]["s"] += 1
-
-                if self.solver.Value(self.shifts[(d, 1, e_idx)]):
-                    n_emp = emp.name
-                    stats[emp.name]["total"] += 1
-                    stats[emp.name]["n"] += 1
-                    if (d, 1) in self.shabbat_indices: stats[emp.name]["s"] += 1
-
-            weekday = date(self.req.year, self.req.month, d).weekday()
-            is_shabbat_m = (weekday == 5)
-            is_shabbat_n = (weekday == 4 or weekday == 5)
+                # Imbalance (day shifts vs night shifts)
+                m_count = cp_model.LinearExpr.Sum([v for v, n in zip(variables[lo:hi], night) if not n]) + carry_m[e_idx]
+                n_count = cp_model.LinearExpr.Sum([v for v, n in zip(variables[lo:hi], night) if n]) + carry_n[e_idx]
+                diff = self.model.NewIntVar(0, 50, f'diff_{e_idx}')
+                self.model.Add(diff >= m_count - n_count)
+                self.model.Add(diff >= n_count - m_count)
+                imbalances.append(diff)
+
+        self.deficits, self.imbalances = deficits, imbalances
+        self._set_objective(self.model, self.req.config.weight_deficit, self.req.config.weight_balance)
+
+    def _set_objective(self, model: cp_model.CpModel, w_def: int, w_bal: int):
+        """
+        Weighted objective on `model`: the engine's own, or a clone of it with the same variable indices
+        (the weight sweep re-weights one built model instead of building it again).
+        """
+        var = model.GetIntVarFromProtoIndex
+        w_chg = self.req.config.weight_change
+        terms = [var(v.Index()) for v in self.deficits + self.imbalances]
+        coeffs = [w_def] * len(self.deficits) + [w_bal] * len(self.imbalances)
+
+        # Minimal change: every previously assigned shift that moves to someone else costs weight_change,
+        # i.e. w_chg * sum(1 - kept) = w_chg * len(previous) - w_chg * sum(kept)
+        kept = [var(self.x[d, s, e].Index()) for (d, s, e) in self.previous if self.eligible[d, s, e]]
+        if self.previous and w_chg:
+            terms += kept
+            coeffs += [-w_chg] * len(kept)
+            model.Minimize(cp_model.LinearExpr.WeightedSum(terms, coeffs) + w_chg * len(self.previous))
+        else:
+            model.Minimize(cp_model.LinearExpr.WeightedSum(terms, coeffs))
+
+    def objective_totals(self, values: np.ndarray) -> Tuple[int, int]:
+        """
+        (total deficit, total imbalance) of a solution grid from _solution_values(), computed from the
+        assignments themselves: with a zero weight the model's deficit/imbalance variables need not be tight.
+        """
+        deficit, imbalance = self.employee_totals(values)
+        return int(deficit.sum()), int(imbalance.sum())
+
+    def employee_totals(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-employee (deficit, imbalance) arrays of a solution grid, summed over the calendar months."""
+        deficit = np.zeros(len(self.req.employees), dtype=np.int64)
+        imbalance = np.zeros(len(self.req.employees), dtype=np.int64)
+        min_shifts = np.array([e.min_shifts for e in self.req.employees])
+        for seg in self.segments:
+            first, last = seg["days"][0], seg["days"][-1]
+            window = values[first:last + 1]
+            mornings = window[:, ~self.is_night, :].sum(axis=(0, 1)) + seg["carry"][0]
+            nights = window[:, self.is_night, :].sum(axis=(0, 1)) + seg["carry"][1]
+            target = min_shifts if seg["share"] == 1 else np.round(min_shifts * seg["share"])
+            deficit += np.maximum(0, target - mornings - nights).astype(np.int64)
+            imbalance += np.abs(mornings - nights)
+        return deficit, imbalance
 
+    def _add_solution_hints(self):
+        # Seed every shift variable with the previous schedule so the search starts next to it
+        if not self.previous:
+            return
+        for d, s, e in zip(*(i.tolist() for i in np.nonzero(self.eligible))):
+            self.model.AddHint(self.x[d, s, e], int((d, s, e) in self.previous))
+
+    def _solution_values(self, response) -> np.ndarray:
+        # One bulk read of the whole solution vector instead of a solver.Value() call per cell
+        solution = np.asarray(response.solution, dtype=np.int8)
+        values = np.zeros(self.eligible.shape, dtype=np.int8)  # (days, shifts, employees) of 0/1
+        values[self.eligible] = solution[self.x_index[self.eligible]]
+        return values
+
+    def _serialize_solution(self, status: str, response) -> ScheduleResponse:
+        """`response` is a CpSolverResponse: the final one, or an intermediate one from a solution callback."""
+        serialize_start = time.perf_counter()
+        values = self._solution_values(response)
+
+        # Who worked each shift
+        names = [e.name for e in self.req.employees]
+        assigned = [[[] for _ in range(self.num_shifts)] for _ in range(self.num_days)]
+        for d, s, e in zip(*(i.tolist() for i in np.nonzero(values))):
+            assigned[d][s].append(names[e])
+        day_slots = np.flatnonzero(~self.is_night).tolist()
+        night_slots = np.flatnonzero(self.is_night).tolist()
+
+        # Per-employee counts as reductions over the grid
+        mornings = values[:, ~self.is_night, :].sum(axis=(0, 1)).tolist()
+        nights = values[:, self.is_night, :].sum(axis=(0, 1)).tolist()
+        shabbat = np.einsum('dse,ds->e', values, self.shabbat_mask.astype(np.int8)).tolist()
+        holiday = np.einsum('dse,ds->e', values, self.holiday_mask.astype(np.int8)).tolist()
+
+        # Build Schedule List
+        schedule_list = []
+        flags = self.flags
+        for d in range(self.num_days):
+            dt = self.dates[d]
+            first_day = next((assigned[d][s][0] for s in day_slots if assigned[d][s]), None)
+            first_night = next((assigned[d][s][0] for s in night_slots if assigned[d][s]), None)
             schedule_list.append(ShiftAssignment(
-                day=d,
-                day_name=calendar.day_name[weekday],
-                morning_employee=m_emp,
-                night_employee=n_emp,
-                is_shabbat_morning=is_shabbat_m,
-                is_shabbat_night=is_shabbat_n
+                day=dt.day,
+                date=dt,
+                day_name=month_index(dt.year, dt.month).day_names[dt.day - 1],
+                morning_employee=first_day,
+                night_employee=first_night,
+                is_shabbat_morning=bool(flags["shabbat_day"][d]),
+                is_shabbat_night=bool(flags["shabbat_eve"][d] or flags["shabbat_day"][d]),
+                holiday=month_index(dt.year, dt.month).holidays.get(dt.day),
+                shifts={st.name: assigned[d][s] for s, st in enumerate(self.shift_types)}
+                if self.req.shift_types is not None else None
             ))
 
         # Build Stats Dict
         stats_response = {}
-        for e in self.req.employees:
-            s = stats[e.name]
+        for e_idx, e in enumerate(self.req.employees):
             stats_response[e.name] = EmployeeStats(
-                total_shifts=s["total"],
-                morning_shifts=s["m"],
-                night_shifts=s["n"],
-                shabbat_shifts=s["s"],
+                total_shifts=mornings[e_idx] + nights[e_idx],
+                morning_shifts=mornings[e_idx],
+                night_shifts=nights[e_idx],
+                shabbat_shifts=shabbat[e_idx],
+                holiday_shifts=holiday[e_idx],
                 min_shifts_req=e.min_shifts,
                 max_shifts_req=e.max_shifts,
                 min_shabbat_req=e.min_shabbat,
-                max_shabbat_req=e.max_shabbat
+                max_shabbat_req=e.max_shabbat,
+                min_holiday_req=e.min_holiday,
+                max_holiday_req=e.max_holiday
             )
+        self.serialize_time = time.perf_counter() - serialize_start
 
         return ScheduleResponse(
-            metadata=SolverMetadata(
-                status=status,
-                objective_value=self.solver.ObjectiveValue(),
-                wall_time=self.solver.WallTime()
-            ),
+            metadata=self._metadata(status, response, objective_value=response.objective_value,
+                                    serialize_time=self.serialize_time),
             schedule=schedule_list,
             statistics=stats_response
-        )
\ No newline at end of file
+        )
+
+
+class _SearchMonitor(cp_model.CpSolverSolutionCallback):
+    """Notes when solutions arrive (time to the first one, last improvement for the stall limit, the trace)."""
+
+    def __init__(self, on_solution: Optional[Callable[[cp_model.CpSolverSolutionCallback], None]] = None):
+        super().__init__()
+        self.on_solution = on_solution
+        self.first_solution_time: Optional[float] = None
+        self.last_improvement: Optional[float] = None  # time.monotonic() of the latest solution
+        self.trace: List[Tuple[float, float]] = []  # (wall time, objective) of every solution
+
+    def on_solution_callback(self):
+        if self.first_solution_time is None:
+            self.first_solution_time = self.WallTime()
+        self.last_improvement = time.monotonic()
+        self.trace.append((self.WallTime(), self.ObjectiveValue()))
+        if self.on_solution is not None:
+            self.on_solution(self)
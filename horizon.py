@@ -0,0 +1,162 @@
+from datetime import timedelta
+from typing import List
+
+import numpy as np
+
+from models import (HorizonRequest, HorizonResponse, ScheduleRequest, ShiftAssignment, EmployeeStats,
+                    SolverMetadata)
+from core import WorkforceSchedulerEngine, relative_gap
+from calendar_index import month_index
+
+
+class RollingHorizonEngine:
+    """
+    Solves an arbitrary date range as overlapping windows of `window_days`. After each window only the first
+    `commit_days` are frozen; they become fixed history for the next window, so the rest rule, the consecutive-day
+    windows and the monthly quotas all carry across window and month boundaries. The uncommitted tail of each
+    window seeds the next one as solution hints. Cost grows linearly with the number of windows.
+    """
+
+    def __init__(self, request: HorizonRequest, concurrent_solves: int = 1):
+        self.req = request
+        self.concurrent_solves = concurrent_solves
+        self._validate()
+        num_days = (request.end_date - request.start_date).days + 1
+        self.dates = [request.start_date + timedelta(days=i) for i in range(num_days)]
+
+    def _validate(self):
+        if self.req.end_date < self.req.start_date:
+            raise ValueError("end_date is before start_date")
+        if self.req.commit_days > self.req.window_days:
+            raise ValueError("commit_days cannot exceed window_days")
+        if any(c.date is None for c in self.req.constraints):
+            raise ValueError("Horizon constraints need a date")
+        if any(a.date is None for a in self.req.history or []):
+            raise ValueError("Horizon history entries need a date")
+
+    def solve(self) -> HorizonResponse:
+        committed: List[ShiftAssignment] = list(self.req.history or [])
+        schedule: List[ShiftAssignment] = []
+        hints: List[ShiftAssignment] = []
+        windows: List[SolverMetadata] = []
+        explanation = None
+        status = "OPTIMAL"
+
+        pos = 0
+        while pos < len(self.dates):
+            window = self.dates[pos:pos + self.req.window_days]
+            is_last = pos + self.req.window_days >= len(self.dates)
+
+            sub_request = ScheduleRequest(
+                year=window[0].year,
+                month=window[0].month,
+                employees=self.req.employees,
+                constraints=[c for c in self.req.constraints if window[0] <= c.date <= window[-1]],
+                config=self.req.config,
+                shift_types=self.req.shift_types,
+                previous_schedule=hints or None,
+                history=committed
+            )
+            result = WorkforceSchedulerEngine(sub_request, self.concurrent_solves, dates=window).solve()
+            windows.append(result.metadata)
+
+            if result.metadata.status not in ["OPTIMAL", "FEASIBLE"]:
+                # Later windows depend on this one, so the horizon stops here with what was committed so far
+                status = result.metadata.status
+                explanation = result.explanation
+                break
+            if result.metadata.status == "FEASIBLE":
+                status = "FEASIBLE"
+
+            keep = result.schedule if is_last else result.schedule[:self.req.commit_days]
+            committed.extend(keep)
+            schedule.extend(keep)
+            hints = result.schedule[len(keep):]
+            pos += len(keep)
+
+        if status == "OPTIMAL" and len(windows) > 1:
+            # Each window is optimal given the ones committed before it, never the plan as a whole; see `windows`
+            status = "FEASIBLE"
+        solved = status in ["OPTIMAL", "FEASIBLE"]
+        objective = self._objective(schedule) if solved else 0.0
+        # Windows overlap and re-solve each other's uncommitted days, so their bounds say nothing about the
+        # committed plan; only a horizon solved as one window has a bound
+        bound = windows[0].best_bound if solved and len(windows) == 1 else None
+        return HorizonResponse(
+            metadata=SolverMetadata(
+                status=status,
+                objective_value=objective,
+                wall_time=sum(w.wall_time for w in windows),
+                build_time=sum(w.build_time for w in windows),
+                serialize_time=sum(w.serialize_time for w in windows),
+                explain_time=sum(w.explain_time for w in windows),
+                parameters=windows[0].parameters if windows else {},
+                conflicts=sum(w.conflicts for w in windows),
+                branches=sum(w.branches for w in windows),
+                num_booleans=sum(w.num_booleans for w in windows),
+                num_constraints=sum(w.num_constraints for w in windows),
+                best_bound=bound,
+                gap=relative_gap(objective, bound),
+                first_solution_time=windows[0].first_solution_time if windows else None,
+                stop_reason=windows[-1].stop_reason if windows else None,
+                interchangeable_employees=max((w.interchangeable_employees for w in windows), default=0)
+            ),
+            schedule=schedule if status in ["OPTIMAL", "FEASIBLE"] else [],
+            statistics=self._monthly_statistics(schedule) if status in ["OPTIMAL", "FEASIBLE"] else {},
+            windows=windows,
+            explanation=explanation
+        )
+
+    def _objective(self, schedule: List[ShiftAssignment]) -> float:
+        """Weighted deficit and imbalance of the committed schedule over the whole range, scored like one window."""
+        request = ScheduleRequest(year=self.dates[0].year, month=self.dates[0].month, employees=self.req.employees,
+                                  config=self.req.config, shift_types=self.req.shift_types,
+                                  previous_schedule=schedule or None, history=self.req.history)
+        engine = WorkforceSchedulerEngine(request, dates=self.dates)
+        values = np.zeros((len(self.dates), engine.num_shifts, len(self.req.employees)), dtype=np.int8)
+        for d, s, e in engine.previous:
+            values[d, s, e] = 1
+        deficit, imbalance = engine.employee_totals(values)
+        config = self.req.config
+        return float(config.weight_deficit * deficit.sum() + config.weight_balance * imbalance.sum())
+
+    def _monthly_statistics(self, schedule: List[ShiftAssignment]):
+        stats = {}
+        for a in schedule:
+            month = stats.setdefault(f"{a.date.year:04d}-{a.date.month:02d}", {
+                e.name: {"total": 0, "m": 0, "n": 0, "s": 0, "h": 0} for e in self.req.employees
+            })
+            idx, d = month_index(a.date.year, a.date.month), a.date.day - 1
+            if a.shifts is None:
+                worked = [(a.morning_employee, False), (a.night_employee, True)]
+            else:
+                worked = [(n, st.is_night) for st in self.req.shift_types for n in a.shifts.get(st.name, [])]
+            for name, is_night in worked:
+                # Night shifts of the eve count too
+                is_shabbat = idx.shabbat_day[d] or (is_night and idx.shabbat_eve[d])
+                is_holiday = idx.holiday_day[d] or (is_night and idx.holiday_eve[d])
+                if name in month:
+                    month[name]["total"] += 1
+                    month[name]["n" if is_night else "m"] += 1
+                    month[name]["s"] += int(is_shabbat)
+                    month[name]["h"] += int(is_holiday)
+
+        return {
+            month: {
+                e.name: EmployeeStats(
+                    total_shifts=counts[e.name]["total"],
+                    morning_shifts=counts[e.name]["m"],
+                    night_shifts=counts[e.name]["n"],
+                    shabbat_shifts=counts[e.name]["s"],
+                    min_shifts_req=e.min_shifts,
+                    max_shifts_req=e.max_shifts,
+                    min_shabbat_req=e.min_shabbat,
+                    max_shabbat_req=e.max_shabbat,
+                    holiday_shifts=counts[e.name]["h"],
+                    min_holiday_req=e.min_holiday,
+                    max_holiday_req=e.max_holiday
+                )
+                for e in self.req.employees
+            }
+            for month, counts in stats.items()
+        }
@@ -0,0 +1,328 @@
+import os
+import time
+import uuid
+import queue
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, List, Optional, Union
+
+from models import (ScheduleRequest, ScheduleResponse, HorizonRequest, SweepRequest, SweepResponse, JobInfo,
+                    SolverMetadata)
+from core import WorkforceSchedulerEngine
+from lns import LNSEngine
+from horizon import RollingHorizonEngine
+from sweep import WeightSweepEngine
+from cache import SolutionCache, canonical_key
+from screening import screen
+import metrics
+
+# --- CONFIGURATION ---
+MAX_WORKERS = int(os.environ.get("SCHEDULER_WORKERS", os.cpu_count() or 1))
+MAX_QUEUED = int(os.environ.get("SCHEDULER_MAX_QUEUED", 16))  # Waiting jobs on top of the running ones
+MAX_FINISHED = int(os.environ.get("SCHEDULER_MAX_FINISHED", 256))  # Finished jobs kept for polling
+
+
+class QueueFullError(Exception):
+    """Raised when the pool already holds as many jobs as it is allowed to."""
+
+
+class UnknownPreviousScheduleError(Exception):
+    """Raised when previous_request_key does not name a cached solution."""
+
+
+class JobNotStoppableError(Exception):
+    """Raised when asking a job that was not submitted for streaming to stop early."""
+
+
+def _run_in_worker(payload: dict, concurrent_solves: int, request_type, engine_type,
+                   run: Optional[Callable] = None) -> dict:
+    """`concurrent_solves`: solves running side by side when this one starts, so CP-SAT can size its threads."""
+    start = time.perf_counter()
+    request = request_type.model_validate(payload)
+    validate_time = time.perf_counter() - start
+
+    engine = engine_type(request, concurrent_solves=concurrent_solves)
+    response = engine.solve() if run is None else run(engine)
+    response.metadata.request_key = canonical_key(request)
+    response.metadata.validate_time = validate_time
+
+    start = time.perf_counter()
+    result = response.model_dump(mode="json")
+    result["metadata"]["encode_time"] = time.perf_counter() - start
+    return result
+
+
+def _schedule_engine(request: ScheduleRequest, concurrent_solves: int = 1):
+    # config.engine picks the monolithic model or large-neighbourhood search; both answer with a ScheduleResponse
+    engine_type = LNSEngine if request.config.engine == "lns" else WorkforceSchedulerEngine
+    return engine_type(request, concurrent_solves=concurrent_solves)
+
+
+def _solve_in_worker(payload: dict, concurrent_solves: int = 1) -> dict:
+    """
+    Runs inside a pool process. Works on plain dicts so nothing but JSON-like data crosses the process boundary.
+    """
+    return _run_in_worker(payload, concurrent_solves, ScheduleRequest, _schedule_engine)
+
+
+def _solve_horizon_in_worker(payload: dict, concurrent_solves: int = 1) -> dict:
+    return _run_in_worker(payload, concurrent_solves, HorizonRequest, RollingHorizonEngine)
+
+
+def _solve_sweep_in_worker(payload: dict, concurrent_solves: int = 1) -> dict:
+    return _run_in_worker(payload, concurrent_solves, SweepRequest, WeightSweepEngine)
+
+
+def _stream_in_worker(payload: dict, events, stop, concurrent_solves: int = 1) -> dict:
+    """
+    Like _solve_in_worker, but every improving solution is put on `events` (a manager queue) as soon as
+    CP-SAT finds it, and setting `stop` (a manager event) ends the search with the best schedule so far.
+    """
+    def run(engine: Union[WorkforceSchedulerEngine, LNSEngine]):
+        def watch():
+            stop.wait()
+            engine.stop()
+
+        watcher = threading.Thread(target=watch, daemon=True)
+        watcher.start()
+        try:
+            return engine.stream(lambda response: events.put(response.model_dump(mode="json")))
+        finally:
+            stop.set()  # Releases the watcher once the search is over
+            watcher.join()
+
+    return _run_in_worker(payload, concurrent_solves, ScheduleRequest, _schedule_engine, run)
+
+
+class _Job:
+    def __init__(self, job_id: str, future: Future):
+        self.job_id = job_id
+        self.future = future
+        self.submitted_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.cancelled = False
+        # Streaming jobs only: intermediate solutions from the worker, and the flag that stops its search
+        self.events = None
+        self.stop = None
+        self.stopped = False
+
+
+class SolverJobQueue:
+    """
+    Bounded pool of solver processes. The event loop only ever touches futures, so a long CP-SAT run
+    never blocks other requests; once running + queued jobs hit the limit, new submissions are refused.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_queued: int = MAX_QUEUED,
+                 max_finished: int = MAX_FINISHED, cache: Optional[SolutionCache] = None):
+        self.max_workers = max_workers
+        self.cache = cache
+        self.capacity = max_workers + max_queued
+        self.max_finished = max_finished
+        self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        self._jobs: "OrderedDict[str, _Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._manager = None  # Started with the first streaming job; carries events between processes
+
+    # --- Submission ---
+
+    def submit(self, request: Union[ScheduleRequest, HorizonRequest, SweepRequest], stream: bool = False) -> str:
+        """
+        With `stream=True` (monthly requests only) the job publishes every improving solution,
+        read with next_event(), and can be ended early with stop().
+        """
+        screened = None
+        if isinstance(request, ScheduleRequest):
+            request = self._resolve_previous(request)
+            screened = self._screen(request)
+        if isinstance(request, SweepRequest):
+            worker = _solve_sweep_in_worker
+        else:
+            worker = _solve_horizon_in_worker if isinstance(request, HorizonRequest) else _solve_in_worker
+        key = canonical_key(request) if self.cache is not None and screened is None else None
+        cached = self.cache.get(key) if key is not None else None
+        events, stop = self._stream_channel() if stream and cached is None and screened is None else (None, None)
+
+        with self._lock:
+            if screened is not None:
+                # Provably infeasible: answered here, so it never takes a worker or a queue slot
+                future = Future()
+                future.set_result(screened)
+            elif cached is not None:
+                # Cache hits never reach a worker, so they are not subject to backpressure
+                cached["metadata"]["cache_hit"] = True
+                future = Future()
+                future.set_result(cached)
+            elif self.depth() >= self.capacity:
+                raise QueueFullError(f"Solver queue is full ({self.capacity} jobs)")
+            else:
+                # Solves running once this one starts: those ahead of it plus itself, at most a full pool.
+                # On an idle pool a job gets every core
+                concurrent = min(self.max_workers, self.depth() + 1)
+                if events is not None:
+                    future = self._executor.submit(_stream_in_worker, request.model_dump(), events, stop, concurrent)
+                else:
+                    future = self._executor.submit(worker, request.model_dump(), concurrent)
+
+            job_id = uuid.uuid4().hex
+            job = _Job(job_id, future)
+            job.events, job.stop = events, stop
+            self._jobs[job_id] = job
+            self._prune()
+
+        future.add_done_callback(lambda _f: self._mark_finished(job, key if cached is None else None))
+        return job_id
+
+    def future(self, job_id: str) -> Future:
+        return self._get(job_id).future
+
+    def next_event(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Next intermediate solution of a streaming job, or None if none arrived within `timeout` seconds."""
+        events = self._get(job_id).events
+        if events is None:
+            return None
+        try:
+            return events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain_events(self, job_id: str) -> List[dict]:
+        """Intermediate solutions still waiting to be read (all of them are in once the job's future is done)."""
+        drained = []
+        while (event := self.next_event(job_id, timeout=0)) is not None:
+            drained.append(event)
+        return drained
+
+    # --- Status ---
+
+    def depth(self) -> int:
+        """Jobs that are queued or still occupying a worker (including cancelled ones that are mid-solve)."""
+        return sum(1 for j in self._jobs.values() if not j.future.done())
+
+    def running(self) -> int:
+        """Jobs currently handed to a worker process."""
+        return sum(1 for j in self._jobs.values() if j.future.running())
+
+    def info(self, job_id: str) -> JobInfo:
+        job = self._get(job_id)
+        f = job.future
+        result, error = None, None
+
+        if job.cancelled:
+            status = "cancelled"
+        elif not f.done():
+            status = "running" if f.running() else "queued"
+        elif f.exception() is not None:
+            status = "failed"
+            error = str(f.exception())
+        else:
+            status = "done"
+            result = f.result()
+
+        return JobInfo(
+            job_id=job.job_id,
+            status=status,
+            submitted_at=job.submitted_at,
+            finished_at=job.finished_at,
+            result=result,
+            error=error
+        )
+
+    # --- Cancellation ---
+
+    def cancel(self, job_id: str) -> JobInfo:
+        """
+        Queued jobs are dropped before they start. A job already inside a worker cannot be interrupted,
+        so it is only marked cancelled and its result is discarded when it arrives.
+        """
+        job = self._get(job_id)
+        if not job.future.done():
+            job.future.cancel()
+            job.cancelled = True
+            job.finished_at = job.finished_at or time.time()
+            if job.stop is not None:
+                # Streaming jobs can be interrupted, which frees the worker right away
+                job.stopped = True
+                job.stop.set()
+        return self.info(job_id)
+
+    def stop(self, job_id: str) -> JobInfo:
+        """
+        Ends the search of a streaming job early. Its result is the best schedule found so far
+        (status FEASIBLE unless optimality was already proven); such results are not cached.
+        """
+        job = self._get(job_id)
+        if not job.future.done():
+            if job.stop is None:
+                raise JobNotStoppableError(f"Job {job_id} was not submitted for streaming and cannot be stopped")
+            job.stopped = True
+            job.stop.set()
+        return self.info(job_id)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+
+    # --- Internals ---
+
+    def _stream_channel(self):
+        # Manager proxies (unlike plain multiprocessing queues) can be passed to an already running pool
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.Manager()
+        return self._manager.Queue(), self._manager.Event()
+
+    def _screen(self, request: ScheduleRequest) -> Optional[dict]:
+        # Response for a request the counting checks already prove INFEASIBLE, None if it needs a real solve
+        reasons = screen(request)
+        if not reasons:
+            return None
+        metadata = SolverMetadata(status="INFEASIBLE", objective_value=0.0, wall_time=0.0, screened=True)
+        if isinstance(request, SweepRequest):
+            return SweepResponse(metadata=metadata, explanation=reasons).model_dump(mode="json")
+        return ScheduleResponse(
+            metadata=metadata,
+            schedule=[],
+            statistics={},
+            explanation=reasons
+        ).model_dump(mode="json")
+
+    def _resolve_previous(self, request: ScheduleRequest) -> ScheduleRequest:
+        # Swap a previous_request_key for the schedule it points to, so workers never need the cache
+        if request.previous_request_key is None:
+            return request
+        cached = self.cache.get(request.previous_request_key) if self.cache is not None else None
+        if cached is None:
+            raise UnknownPreviousScheduleError(f"No cached schedule for key: {request.previous_request_key}")
+        return request.model_copy(update={
+            "previous_schedule": ScheduleResponse.model_validate(cached).schedule,
+            "previous_request_key": None
+        })
+
+    def _get(self, job_id: str) -> _Job:
+        try:
+            return self._jobs[job_id]
+        except KeyError:
+            raise KeyError(f"Unknown job: {job_id}")
+
+    def _mark_finished(self, job: _Job, cache_key: Optional[str] = None):
+        if job.finished_at is None:
+            job.finished_at = time.time()
+        f = job.future
+        if f.cancelled():
+            return
+        if f.exception() is not None:
+            metrics.record_failure()
+            return
+        metrics.record_result(f.result())
+        if cache_key is not None and not job.stopped:
+            self.cache.put(cache_key, f.result())
+
+    def _prune(self):
+        # Forget the oldest finished jobs so polling history does not grow forever
+        finished = [jid for jid, j in self._jobs.items() if j.future.done()]
+        for jid in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[jid]
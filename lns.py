@@ -0,0 +1,336 @@
+import time
+import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from ortools.sat.python import cp_model
+from ortools.sat import cp_model_pb2
+
+from models import ScheduleRequest, ScheduleResponse
+from core import WorkforceSchedulerEngine, relative_gap, solve_cores
+
+# --- CONFIGURATION ---
+NEIGHBOURHOOD_SECONDS = 2.0  # Time limit of one sub-model solve
+WINDOW_DAYS = 7  # Days a time-window neighbourhood frees (for every employee), before adapting
+SUBSET_EMPLOYEES = 40  # Employees an employee neighbourhood frees (for every day), before adapting
+MIN_DIFFICULTY, MAX_DIFFICULTY = 0.25, 8.0  # Range of the adaptive neighbourhood size factor
+
+# Limits that apply to the whole search; sub-models get their own time limit and always search to the end
+SEARCH_LIMITS = {"max_time_in_seconds", "stop_after_first_solution", "relative_gap_limit", "absolute_gap_limit"}
+
+
+def greedy_roster(engine: WorkforceSchedulerEngine, rnd: random.Random) -> np.ndarray:
+    """
+    (days, shifts, employees) grid of 0/1 filled day by day, scarcest shift first. Every pick respects
+    eligibility, one shift a day, the rest rule, the consecutive-shift and consecutive-day windows (history
+    included) and the monthly maximums; among those allowed it prefers whoever still needs Shabbat or holiday
+    shifts, then the largest shortfall against min_shifts, then whoever evens out their day/night balance.
+    Minimums are only preferred, not guaranteed, and a shift with nobody left to take it stays short.
+    """
+    D, S, E = engine.eligible.shape
+    H = engine.HISTORY_DAYS
+    employees = engine.req.employees
+    headcount = [st.headcount for st in engine.shift_types]
+    is_night = engine.is_night
+
+    grid = np.zeros((D, S, E), dtype=np.int8)
+    worked = np.zeros((H + D, S, E), dtype=bool)  # History tail first, so the windows reach back into it
+    worked[:H] = engine.history_tail > 0
+
+    seg_of = np.zeros(D, dtype=int)
+    for g, seg in enumerate(engine.segments):
+        seg_of[seg["days"]] = g
+    carry = np.array([seg["carry"] for seg in engine.segments])  # (segments, 4, employees)
+    mornings, nights, shabbat, holiday = (carry[:, i].copy() for i in range(4))
+
+    max_shifts = np.array([e.max_shifts for e in employees])
+    max_shabbat = np.array([e.max_shabbat for e in employees])
+    max_holiday = np.array([e.max_holiday if e.max_holiday is not None else D * S for e in employees])
+    min_shifts = np.array([e.min_shifts for e in employees])
+    min_shabbat = np.array([e.min_shabbat for e in employees])
+    min_holiday = np.array([e.min_holiday for e in employees])
+    # Per-segment targets, pro-rated the way the model pro-rates them
+    target = np.array([min_shifts if seg["share"] == 1 else np.round(min_shifts * seg["share"])
+                       for seg in engine.segments])
+    need_shabbat = np.array([(min_shabbat if seg["share"] == 1 else (min_shabbat * seg["share"]).astype(int))
+                             if seg["closes_month"] else np.zeros(E, dtype=int) for seg in engine.segments])
+    need_holiday = np.array([(min_holiday if seg["share"] == 1 else (min_holiday * seg["share"]).astype(int))
+                             if seg["closes_month"] else np.zeros(E, dtype=int) for seg in engine.segments])
+    tie = np.array(rnd.sample(range(E), E))  # Random tie-break, so equal employees share the load
+
+    for d in range(D):
+        k, g = H + d, seg_of[d]
+        days_worked = worked[k - 3:k].any(axis=1).sum(axis=0)  # Of the previous 3 days
+        night_before = worked[k - 1, is_night].any(axis=0)
+        free = (days_worked < 3) & (mornings[g] + nights[g] < max_shifts)
+        for s in np.argsort(engine.eligible[d].sum(axis=1), kind="stable").tolist():
+            candidates = engine.eligible[d, s] & free & (worked[k - 2:k, s].sum(axis=0) < 2)
+            if not is_night[s]:
+                candidates &= ~night_before
+            if engine.shabbat_mask[d, s]:
+                candidates &= shabbat[g] < max_shabbat
+            if engine.holiday_mask[d, s]:
+                candidates &= holiday[g] < max_holiday
+            idx = np.flatnonzero(candidates)
+            if not idx.size:
+                continue
+
+            needs = np.zeros(idx.size, dtype=int)
+            if engine.shabbat_mask[d, s]:
+                needs += shabbat[g, idx] < need_shabbat[g, idx]
+            if engine.holiday_mask[d, s]:
+                needs += holiday[g, idx] < need_holiday[g, idx]
+            shortfall = target[g, idx] - mornings[g, idx] - nights[g, idx]
+            balance = (mornings[g, idx] - nights[g, idx]) * (1 if is_night[s] else -1)
+            chosen = idx[np.lexsort((tie[idx], -balance, -shortfall, -needs))][:headcount[s]]
+
+            grid[d, s, chosen] = 1
+            worked[k, s, chosen] = True
+            free[chosen] = False
+            (nights if is_night[s] else mornings)[g, chosen] += 1
+            shabbat[g, chosen] += int(engine.shabbat_mask[d, s])
+            holiday[g, chosen] += int(engine.holiday_mask[d, s])
+    return grid
+
+
+class LNSEngine:
+    """
+    Large-neighbourhood search for rosters too large for one CP-SAT search (hundreds of employees, many sites),
+    with the same request and response as WorkforceSchedulerEngine. The model is built once. A greedy roster
+    (or the previous schedule) is handed to CP-SAT as a hint for a first feasible schedule; from then on each
+    step frees a window of days or a subset of employees, fixes every other cell to the best schedule so far
+    and re-optimises that sub-model. Steps run on threads of their own (CP-SAT releases the GIL) and the
+    neighbourhood size adapts: it grows while sub-models are solved to optimality and shrinks when they time out.
+    """
+
+    def __init__(self, request: ScheduleRequest, concurrent_solves: int = 1):
+        self.req = request
+        self.engine = WorkforceSchedulerEngine(request, concurrent_solves)
+        self.parallel = solve_cores(concurrent_solves)  # Neighbourhoods solved at once, one per core of the job
+        self.parameters = {k: v for k, v in self.engine.parameters.items() if k not in SEARCH_LIMITS}
+        self.parameters["num_workers"] = 1  # Per sub-model
+        self.rnd = random.Random(request.config.random_seed or 0)
+        self.difficulty = {"days": 1.0, "employees": 1.0}
+        self.stopped = False
+        self._solvers = set()  # Running sub-model solvers, for stop()
+        self._lock = threading.Lock()
+
+    def stream(self, on_solution: Callable[[ScheduleResponse], None]) -> ScheduleResponse:
+        """Like WorkforceSchedulerEngine.stream(): every improving schedule is handed to `on_solution`."""
+        return self.solve(on_solution)
+
+    def stop(self):
+        """Ends the search early; solve() then returns the best schedule found so far. Thread-safe."""
+        self.stopped = True
+        self._interrupt()
+
+    def _interrupt(self):
+        with self._lock:
+            for solver in self._solvers:
+                solver.StopSearch()
+
+    def solve(self, on_solution: Optional[Callable[[ScheduleResponse], None]] = None) -> ScheduleResponse:
+        engine, config = self.engine, self.req.config
+        engine.build()
+        start = time.perf_counter()
+        deadline = start + config.timeout_seconds
+
+        # First schedule: the greedy roster when it satisfies every rule, else CP-SAT completes or repairs it
+        initial = engine.model.Clone()
+        status_val = cp_model.UNKNOWN
+        if not engine.previous:  # Otherwise the model is already hinted with the previous schedule
+            greedy = greedy_roster(engine, self.rnd)
+            initial.ClearHints()
+            self._hint(initial, *self._complete_hint(greedy))
+            # With every cell fixed CP-SAT only checks the roster, in a fraction of the time of a search
+            checked = initial.Clone()
+            self._fix(checked, engine.x_index[engine.eligible].tolist(), greedy[engine.eligible].tolist())
+            status_val, best = self._solve_model(checked, {**self.parameters, "max_time_in_seconds":
+                                                           min(NEIGHBOURHOOD_SECONDS, config.timeout_seconds)})
+            bound = 0.0  # Fixed cells prove nothing about the roster; every objective term is >= 0
+        if status_val not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+            status_val, best = self._solve_model(initial, {
+                **engine.parameters, "stop_after_first_solution": True,
+                "max_time_in_seconds": max(0.01, deadline - time.perf_counter())})
+            if status_val not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+                return self._failed(cp_model_pb2.CpSolverStatus.Name(status_val), best)
+            bound = best.best_objective_bound
+
+        first_solution_time = time.perf_counter() - start
+        trace = [(first_solution_time, best.objective_value)]
+        conflicts, branches, steps = best.num_conflicts, best.num_branches, 0
+        last_improvement = time.monotonic()
+        self._publish(on_solution, best, start)
+
+        # Large-neighbourhood search
+        stop_reason = None
+        with ThreadPoolExecutor(self.parallel) as pool:
+            running = set()
+            while True:
+                if stop_reason is None:
+                    stop_reason = self._stop_reason(best.objective_value, bound, deadline, last_improvement)
+                    if stop_reason is not None:
+                        self._interrupt()  # Sub-models still running end with what they have
+                while stop_reason is None and len(running) < self.parallel:
+                    kind, free = self._neighbourhood(engine._solution_values(best))
+                    running.add(pool.submit(self._solve_neighbourhood, kind, free, best, deadline))
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, free, status_val, response = future.result()
+                    steps += 1
+                    conflicts += response.num_conflicts
+                    branches += response.num_branches
+                    # Exhausted neighbourhoods grow, ones that ran out of time shrink
+                    factor = 1.2 if status_val == cp_model.OPTIMAL else 1 / 1.2
+                    self.difficulty[kind] = min(MAX_DIFFICULTY, max(MIN_DIFFICULTY, self.difficulty[kind] * factor))
+                    if status_val == cp_model.OPTIMAL and free.all():
+                        bound = max(bound, response.objective_value)  # Nothing was fixed: a proof for the roster
+                    if (status_val in [cp_model.OPTIMAL, cp_model.FEASIBLE]
+                            and response.objective_value < best.objective_value):
+                        best = response
+                        trace.append((time.perf_counter() - start, best.objective_value))
+                        last_improvement = time.monotonic()
+                        self._publish(on_solution, best, start)
+
+        proven = best.objective_value <= bound
+        result = engine._serialize_solution("OPTIMAL" if proven else "FEASIBLE", best)
+        meta = result.metadata
+        meta.wall_time = time.perf_counter() - start
+        meta.parameters = self.parameters
+        meta.conflicts, meta.branches = conflicts, branches
+        meta.best_bound = bound
+        meta.gap = relative_gap(best.objective_value, bound)
+        meta.first_solution_time = first_solution_time
+        meta.stop_reason = "optimal" if proven else stop_reason
+        meta.objective_trace = trace
+        meta.neighbourhoods = steps
+        return result
+
+    def _stop_reason(self, objective: float, bound: float, deadline: float,
+                     last_improvement: float) -> Optional[str]:
+        # Why the search should end now (the same reasons as WorkforceSchedulerEngine), or None to go on
+        config = self.req.config
+        if objective <= bound:
+            return "optimal"
+        if self.stopped:
+            return "stopped"
+        if config.relative_gap is not None and relative_gap(objective, bound) <= config.relative_gap:
+            return "gap"
+        if config.absolute_gap is not None and objective - bound <= config.absolute_gap:
+            return "gap"
+        if config.stall_seconds is not None and time.monotonic() - last_improvement >= config.stall_seconds:
+            return "stall"
+        if time.perf_counter() >= deadline - 0.05:
+            return "time_limit"
+        return None
+
+    def _neighbourhood(self, values: np.ndarray) -> Tuple[str, np.ndarray]:
+        """
+        (kind, free cells) of the next step. Time windows and employee subsets alternate at random; half of an
+        employee subset are the employees costing the most under the current schedule, the rest are random.
+        """
+        engine = self.engine
+        free = np.zeros(engine.eligible.shape, dtype=bool)
+        kind = self.rnd.choice(["days", "employees"])
+        if kind == "days":
+            size = min(engine.num_days, max(1, round(WINDOW_DAYS * self.difficulty[kind])))
+            first = self.rnd.randrange(engine.num_days - size + 1)
+            free[first:first + size] = True
+            return kind, free
+
+        num_employees = len(self.req.employees)
+        size = min(num_employees, max(2, round(SUBSET_EMPLOYEES * self.difficulty[kind])))
+        deficit, imbalance = engine.employee_totals(values)
+        cost = self.req.config.weight_deficit * deficit + self.req.config.weight_balance * imbalance
+        worst = [e for e in np.argsort(-cost, kind="stable")[:size // 2].tolist() if cost[e] > 0]
+        taken = set(worst)
+        others = [e for e in range(num_employees) if e not in taken]
+        chosen = worst + self.rnd.sample(others, size - len(worst))
+        free[:, :, chosen] = True
+        return kind, free
+
+    def _solve_neighbourhood(self, kind: str, free: np.ndarray, best, deadline: float):
+        engine = self.engine
+        model = engine.model.Clone()
+        solution = list(best.solution)
+        fixed = engine.x_index[engine.eligible & ~free].tolist()
+        self._fix(model, fixed, [solution[i] for i in fixed])
+        model.ClearHints()
+        self._hint(model, range(len(solution)), solution)
+        status_val, response = self._solve_model(model, {**self.parameters, "max_time_in_seconds":
+                                                         max(0.01, min(NEIGHBOURHOOD_SECONDS,
+                                                                       deadline - time.perf_counter()))})
+        return kind, free, status_val, response
+
+    def _solve_model(self, model: cp_model.CpModel, parameters: dict):
+        solver = cp_model.CpSolver()
+        self.engine._apply_parameters(solver, parameters)
+        return self._run(solver, model), solver.ResponseProto()
+
+    def _run(self, solver: cp_model.CpSolver, model: cp_model.CpModel) -> int:
+        with self._lock:
+            if self.stopped:
+                solver.parameters.max_time_in_seconds = 0.0  # Returns UNKNOWN right away, with a response
+            self._solvers.add(solver)
+        try:
+            return solver.Solve(model)
+        finally:
+            with self._lock:
+                self._solvers.discard(solver)
+
+    def _complete_hint(self, values: np.ndarray) -> Tuple[List[int], List[int]]:
+        """
+        (variable indices, values) of a roster grid plus the deficit and imbalance variables it implies.
+        CP-SAT only takes a hint as its first solution when every variable is hinted.
+        """
+        engine = self.engine
+        indices = engine.x_index[engine.eligible].tolist()
+        hinted = values[engine.eligible].tolist()
+        min_shifts = np.array([e.min_shifts for e in self.req.employees])
+        deficits, imbalances = [], []
+        for seg in engine.segments:  # Same order as _add_objectives()
+            window = values[seg["days"][0]:seg["days"][-1] + 1]
+            mornings = window[:, ~engine.is_night, :].sum(axis=(0, 1)) + seg["carry"][0]
+            nights = window[:, engine.is_night, :].sum(axis=(0, 1)) + seg["carry"][1]
+            target = min_shifts if seg["share"] == 1 else np.round(min_shifts * seg["share"])
+            deficits += np.maximum(0, target - mornings - nights).astype(int).tolist()
+            imbalances += np.abs(mornings - nights).tolist()
+        for variables, amounts in ((engine.deficits, deficits), (engine.imbalances, imbalances)):
+            indices += [v.Index() for v in variables]
+            hinted += amounts
+        return indices, hinted
+
+    @staticmethod
+    def _fix(model: cp_model.CpModel, indices: List[int], values: List[int]):
+        variables = model.Proto().variables
+        for i, value in zip(indices, values):
+            domain = variables[i].domain
+            domain.clear()
+            domain.extend([value, value])
+
+    @staticmethod
+    def _hint(model: cp_model.CpModel, indices, values):
+        # Written straight into the proto: one AddHint() call per variable is slow on large rosters
+        hint = model.Proto().solution_hint
+        hint.vars.extend(indices)
+        hint.values.extend(values)
+
+    def _publish(self, on_solution: Optional[Callable[[ScheduleResponse], None]], response, start: float):
+        if on_solution is None:
+            return
+        result = self.engine._serialize_solution("FEASIBLE", response)
+        result.metadata.wall_time = time.perf_counter() - start
+        on_solution(result)
+
+    def _failed(self, status: str, response) -> ScheduleResponse:
+        explanation = None
+        if status == "INFEASIBLE" and self.req.config.explain_infeasible:
+            explanation = self.engine.explain()
+        metadata = self.engine._metadata(status, response, objective_value=0.0)
+        metadata.parameters = self.parameters
+        metadata.stop_reason = "infeasible" if status == "INFEASIBLE" else "stopped" if self.stopped else "time_limit"
+        return ScheduleResponse(metadata=metadata, schedule=[], statistics={}, explanation=explanation)
@@ -1,35 +1,269 @@
-from fastapi import FastAPI, HTTPException
-from models import ScheduleRequest, ScheduleResponse
-from core import WorkforceSchedulerEngine
+import time
+import zlib
+import asyncio
+from typing import Callable, Union
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+from fastapi.middleware.gzip import GZipMiddleware
+from models import (ScheduleRequest, ScheduleResponse, HorizonRequest, HorizonResponse, JobInfo,
+                    BatchScheduleRequest, BatchScheduleResponse, SweepRequest, SweepResponse)
+from batch import solve_batch
+from stream import solution_events
+from jobs import SolverJobQueue, QueueFullError, UnknownPreviousScheduleError, JobNotStoppableError
+from cache import SolutionCache
+import metrics
+import wire
 import uvicorn
 
-app = FastAPI(title="Workforce Scheduler API", version="1.0.0")
+jobs: SolverJobQueue = None
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # The pool is started here (not at import) so worker processes are only spawned by the server itself
+    global jobs
+    jobs = SolverJobQueue(cache=SolutionCache())
+    metrics.bind_queue(jobs)
+    yield
+    jobs.shutdown()
+
+
+class DecompressingRequest(Request):
+    """Request whose body() has its Content-Encoding (gzip or deflate) removed."""
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_decoded_body"):
+            try:
+                self._decoded_body = wire.decompress(await super().body(), self.headers.get("content-encoding"))
+            except wire.UnsupportedEncodingError as e:
+                raise HTTPException(status_code=415, detail=str(e))
+            except wire.BodyTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            except zlib.error as e:
+                raise HTTPException(status_code=400, detail=f"Corrupt compressed body: {e}")
+        return self._decoded_body
+
+
+class DecompressingRoute(APIRoute):
+    # Lets clients gzip large rosters; FastAPI then validates the decompressed JSON as usual
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def decompressing_handler(request: Request) -> Response:
+            return await handler(DecompressingRequest(request.scope, request.receive))
+
+        return decompressing_handler
+
+
+app = FastAPI(title="Workforce Scheduler API", version="1.0.0", lifespan=lifespan)
+app.router.route_class = DecompressingRoute
+# Compresses responses for clients that accept gzip (schedules are large and repetitive); SSE is left alone
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    # Covers FastAPI's own request validation and response encoding on top of the solver phases
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.HTTP_SECONDS.labels(method=request.method, path=route.path if route else "unmatched").observe(
+        time.perf_counter() - start)
+    return response
+
+
+def _submit(request: Union[ScheduleRequest, HorizonRequest, SweepRequest], stream: bool = False) -> str:
+    try:
+        return jobs.submit(request, stream=stream)
+    except QueueFullError as e:
+        # Backpressure: tell the client to come back later instead of queueing without bound
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except UnknownPreviousScheduleError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        # Raised while screening or indexing the request (e.g. month=13): the request itself is unusable
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _media_type(http_request: Request) -> str:
+    # Checked before submitting, so no solve runs for a response the client could not read
+    media_type = wire.negotiate(http_request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Supported media types: {', '.join(wire.media_types())}")
+    return media_type
+
+
+def _encoded(http_request: Request, media_type: str, data: dict,
+             columnar: Callable[[dict], dict] = wire.to_columnar) -> Response:
+    """
+    `data` in the negotiated wire format (row or columnar layout, JSON or MessagePack), encoded directly
+    instead of re-validating it through the response model. Carries a weak ETag.
+    """
+    headers = {"ETag": wire.etag(data, media_type), "Vary": "Accept"}
+    if http_request.method == "GET" and headers["ETag"] in http_request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    if media_type in wire.COLUMNAR:
+        data = columnar(data)
+    return Response(wire.encode(data, media_type), media_type=media_type, headers=headers)
+
+
+def _get_job(job_id: str) -> JobInfo:
+    try:
+        return jobs.info(job_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 
 @app.post("/schedule", response_model=ScheduleResponse)
-async def generate_schedule(request: ScheduleRequest):
+async def generate_schedule(request: ScheduleRequest, http_request: Request):
     """
     Generates a monthly schedule based on employee constraints and AI-injected rules.
+    Thin synchronous wrapper over the job queue: submits a job and waits for it without blocking the event loop.
     """
-    try:
-        # 1. Initialize Engine with Request Data
-        engine = WorkforceSchedulerEngine(request)
+    media_type = _media_type(http_request)
+    job_id = _submit(request)
 
-        # 2. Run Optimization
-        result = engine.solve()
+    try:
+        result = await asyncio.wrap_future(jobs.future(job_id))
 
-        # 3. Check for specific failure cases (optional logic)
-        if result.metadata.status not in ["OPTIMAL", "FEASIBLE"]:
+        # Check for specific failure cases (optional logic)
+        if result["metadata"]["status"] not in ["OPTIMAL", "FEASIBLE"]:
             # In a real system, you might want to return a 422 here,
             # but returning the metadata allows the AI to see 'INFEASIBLE'
             pass
 
-        return result
+        return _encoded(http_request, media_type, result)
 
+    except asyncio.CancelledError:
+        # Client went away: free the slot if the job has not started yet
+        jobs.cancel(job_id)
+        raise
     except Exception as e:
         # Catch unexpected errors (e.g., date errors, internal logic bugs)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/schedule/stream")
+async def stream_schedule(request: ScheduleRequest):
+    """
+    Solves like /schedule but sends Server-Sent Events while the search runs: `job` (its id), a `solution`
+    for every improving schedule, then `done` with the final response. POST /jobs/{id}/stop (or closing the
+    connection) ends the search early once the current schedule is good enough.
+    """
+    job_id = _submit(request, stream=True)
+    return StreamingResponse(solution_events(jobs, job_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/schedule/horizon", response_model=HorizonResponse)
+async def generate_horizon(request: HorizonRequest, http_request: Request):
+    """
+    Schedules an arbitrary date range (e.g. a quarter) as rolling windows, carrying the rest rule,
+    consecutive-day limits and monthly quotas across month boundaries.
+    """
+    media_type = _media_type(http_request)
+    job_id = _submit(request)
+    try:
+        return _encoded(http_request, media_type, await asyncio.wrap_future(jobs.future(job_id)))
+    except asyncio.CancelledError:
+        jobs.cancel(job_id)
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/schedule/sweep", response_model=SweepResponse)
+async def generate_sweep(request: SweepRequest, http_request: Request):
+    """
+    Solves the month once per (weight_deficit, weight_balance) pair of a grid, in parallel on one built model,
+    and returns the Pareto front of total deficit against total imbalance with a schedule per point.
+    """
+    media_type = _media_type(http_request)
+    job_id = _submit(request)
+    try:
+        return _encoded(http_request, media_type, await asyncio.wrap_future(jobs.future(job_id)), _columnar_front)
+    except asyncio.CancelledError:
+        jobs.cancel(job_id)
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/schedule/batch", response_model=BatchScheduleResponse)
+async def generate_schedule_batch(batch: BatchScheduleRequest, http_request: Request, stream: bool = False):
+    """
+    Solves many rosters (e.g. one per site) in parallel on the solver pool.
+    Every item gets its own status, so a failed or INFEASIBLE site never aborts the batch.
+    With ?stream=true results are sent as NDJSON lines in completion order instead of one ordered response.
+    """
+    if stream:
+        async def lines():
+            async for item in solve_batch(jobs, batch):
+                yield item.model_dump_json() + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    media_type = _media_type(http_request)
+    start = time.perf_counter()
+    results = [item async for item in solve_batch(jobs, batch)]
+    results.sort(key=lambda item: item.index)
+    response = BatchScheduleResponse(results=results, wall_time=time.perf_counter() - start)
+    return _encoded(http_request, media_type, response.model_dump(mode="json"), _columnar_results)
+
+
+def _columnar_result(data: dict) -> dict:
+    # Batch items and jobs carry a schedule response under "result" (None until there is one)
+    return {**data, "result": data["result"] and wire.to_columnar(data["result"])}
+
+
+def _columnar_results(data: dict) -> dict:
+    return {**data, "results": [_columnar_result(item) for item in data["results"]]}
+
+
+def _columnar_front(data: dict) -> dict:
+    return {**data, "front": [_columnar_result(point) for point in data["front"]]}
+
+
+# --- Job API ---
+
+@app.post("/jobs", response_model=JobInfo, status_code=202)
+async def submit_job(request: Union[ScheduleRequest, HorizonRequest]):
+    """Queues a solve and returns immediately with a job id to poll."""
+    return jobs.info(_submit(request))
+
+
+@app.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_job(job_id: str, http_request: Request):
+    """Status of a job; carries the schedule once it is done. Answers 304 to a matching If-None-Match."""
+    media_type = _media_type(http_request)
+    return _encoded(http_request, media_type, _get_job(job_id).model_dump(mode="json"), _columnar_result)
+
+
+@app.post("/jobs/{job_id}/stop", response_model=JobInfo)
+async def stop_job(job_id: str):
+    """Ends the search of a streaming job; it finishes with the best schedule found so far."""
+    _get_job(job_id)
+    try:
+        return jobs.stop(job_id)
+    except JobNotStoppableError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.delete("/jobs/{job_id}", response_model=JobInfo)
+async def cancel_job(job_id: str):
+    """Cancels a job. Queued jobs never run; running ones have their result discarded."""
+    _get_job(job_id)
+    return jobs.cancel(job_id)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: phase timings, search statistics, in-flight solves and queue depth."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
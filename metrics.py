@@ -0,0 +1,65 @@
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# Solves take anything from milliseconds (small rosters, cache hits) to the full timeout
+PHASE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = (100, 500, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000)
+
+PHASES = {
+    "validate": "validate_time",
+    "build": "build_time",
+    "solve": "wall_time",
+    "serialize": "serialize_time",
+    "encode": "encode_time",
+}
+
+PHASE_SECONDS = Histogram("scheduler_phase_seconds", "Time spent per solve phase", ["phase"], buckets=PHASE_BUCKETS)
+SOLVES = Counter("scheduler_solves_total", "Finished solves by solver status", ["status"])
+FAILURES = Counter("scheduler_solve_failures_total", "Solves that raised instead of returning a status")
+CACHE_HITS = Counter("scheduler_cache_hits_total", "Requests answered from the solution cache")
+SCREENED = Counter("scheduler_screened_total", "Requests rejected as infeasible by the pre-solve screening")
+CONFLICTS = Counter("scheduler_search_conflicts_total", "CP-SAT conflicts over all solves")
+BRANCHES = Counter("scheduler_search_branches_total", "CP-SAT branches over all solves")
+BOOLEANS = Histogram("scheduler_model_booleans", "Boolean variables per CP model", buckets=SIZE_BUCKETS)
+CONSTRAINTS = Histogram("scheduler_model_constraints", "Constraints per CP model", buckets=SIZE_BUCKETS)
+GAP = Histogram("scheduler_objective_gap", "Relative gap between objective and best bound at the end of a solve",
+                buckets=(0.0, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0))
+HTTP_SECONDS = Histogram("scheduler_http_request_seconds", "End-to-end request latency including response encoding",
+                         ["method", "path"], buckets=PHASE_BUCKETS)
+IN_FLIGHT = Gauge("scheduler_inflight_solves", "Solves currently running in a worker process")
+QUEUE_DEPTH = Gauge("scheduler_queue_depth", "Solves waiting for a free worker")
+
+
+def bind_queue(queue):
+    """Reads the gauges straight from the job queue at scrape time."""
+    IN_FLIGHT.set_function(queue.running)
+    QUEUE_DEPTH.set_function(lambda: queue.depth() - queue.running())
+
+
+def record_result(response: dict):
+    """Exports one finished response (as returned by a solver worker) to the counters and histograms."""
+    meta = response["metadata"]
+    if meta.get("cache_hit"):
+        CACHE_HITS.inc()
+        return
+    if meta.get("screened"):
+        SCREENED.inc()
+        return
+
+    SOLVES.labels(status=meta["status"]).inc()
+    for phase, field in PHASES.items():
+        PHASE_SECONDS.labels(phase=phase).observe(meta.get(field, 0.0))
+    CONFLICTS.inc(meta.get("conflicts", 0))
+    BRANCHES.inc(meta.get("branches", 0))
+    BOOLEANS.observe(meta.get("num_booleans", 0))
+    CONSTRAINTS.observe(meta.get("num_constraints", 0))
+
+    if meta.get("gap") is not None:
+        GAP.observe(meta["gap"])
+
+
+def record_failure():
+    FAILURES.inc()
+
+
+def render() -> bytes:
+    return generate_latest()
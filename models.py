@@ -1,5 +1,7 @@
-from typing import List, Optional, Dict
-from pydantic import BaseModel, Field
+import datetime
+from typing import Any, List, Literal, Optional, Dict, Tuple, Union
+from pydantic import BaseModel, Field, field_validator
+from ortools.sat import sat_parameters_pb2
 
 # --- Input Models ---
 
@@ -10,16 +12,60 @@ class EmployeeConfig(BaseModel):
     min_shabbat: int
     max_shabbat: int
     shabbat_night_only: bool = False
+    min_holiday: int = 0  # Holiday shifts (Yom Tov and the night before), counted like Shabbat shifts
+    max_holiday: Optional[int] = None  # None = no limit
+
+class ShiftType(BaseModel):
+    name: str
+    headcount: int = Field(1, ge=1)  # Employees required on this shift every day
+    is_night: bool = False  # Rest rule: no day shift the morning after a night shift
+
+DEFAULT_SHIFT_TYPES = [ShiftType(name="Morning"), ShiftType(name="Night", is_night=True)]
 
 class UnavailabilityConstraint(BaseModel):
     employee_name: str
     day: int
-    shift: Optional[int] = None  # 0=Morning, 1=Night, None=All Day
+    shift: Optional[int] = None  # Index into shift_types (default: 0=Morning, 1=Night), None=All Day
+    date: Optional[datetime.date] = None  # Full date; wins over `day` when set (required in horizon requests)
 
 class SolverConfig(BaseModel):
     weight_deficit: int = 10     # Weight for missing min_shifts
     weight_balance: int = 1      # Weight for M/N balance
+    weight_change: int = 0       # Weight for reassigning a shift away from the previous schedule (0 = off)
     timeout_seconds: float = 10.0
+    # CP-SAT search settings: a named profile, then explicit overrides on top of it
+    profile: Literal["fast-feasible", "balanced", "prove-optimal"] = "balanced"
+    num_workers: Optional[int] = None  # Search workers per solve (None = share the free cores)
+    random_seed: Optional[int] = None
+    parameters: Dict[str, Union[bool, int, float, str]] = {}  # Raw SatParameters fields, e.g. {"linearization_level": 2}
+    explain_infeasible: bool = True  # On INFEASIBLE, spend one extra solve naming the conflicting rules
+    # Interchangeable employees: "solver" leaves them to CP-SAT's own symmetry detection (symmetry_level >= 1);
+    # "lex" adds explicit lexicographic ordering constraints, for when that detection is off or times out
+    symmetry_breaking: Literal["solver", "lex"] = "solver"
+    # "lns" solves large rosters (hundreds of employees) by improving a greedy roster one neighbourhood at a time
+    engine: Literal["cp-sat", "lns"] = "cp-sat"
+    # Anytime stopping: end the search once the schedule is provably good enough, or stops improving
+    relative_gap: Optional[float] = Field(None, ge=0)  # (objective - bound) / objective, e.g. 0.01 for 1%
+    absolute_gap: Optional[float] = Field(None, ge=0)  # objective - bound
+    stall_seconds: Optional[float] = Field(None, gt=0)  # No better schedule found for this long
+
+    @field_validator("parameters")
+    @classmethod
+    def _check_parameters(cls, parameters: Dict[str, Union[bool, int, float, str]]):
+        # Checked on arrival, so a misspelt name or a wrongly typed value is a 422 instead of a failed solve
+        fields = sat_parameters_pb2.SatParameters.DESCRIPTOR.fields_by_name
+        scratch = sat_parameters_pb2.SatParameters()
+        for name, value in parameters.items():
+            field = fields.get(name)
+            if field is None:
+                raise ValueError(f"Unknown CP-SAT parameter: {name}")
+            if field.label == field.LABEL_REPEATED or (field.type == field.TYPE_BOOL) != isinstance(value, bool):
+                raise ValueError(f"Invalid value for CP-SAT parameter {name}: {value!r}")
+            try:
+                setattr(scratch, name, value)
+            except (TypeError, ValueError, AttributeError) as e:
+                raise ValueError(f"Invalid value for CP-SAT parameter {name}: {e}")
+        return parameters
 
 class ScheduleRequest(BaseModel):
     year: int
@@ -27,16 +73,47 @@ class ScheduleRequest(BaseModel):
     employees: List[EmployeeConfig]
     constraints: List[UnavailabilityConstraint] = []
     config: SolverConfig = SolverConfig()
+    shift_types: Optional[List[ShiftType]] = None  # Default: one Morning and one Night shift per day
+    # Warm start: a previously published schedule, or the request_key of a cached solve to take it from
+    previous_schedule: Optional[List["ShiftAssignment"]] = None
+    previous_request_key: Optional[str] = None
+    # Fixed assignments before the month (e.g. the tail of last month's published schedule), so the rest and
+    # consecutive-day rules carry across the boundary. Entries without a date are days of the previous month.
+    history: Optional[List["ShiftAssignment"]] = None
+
+class HorizonRequest(BaseModel):
+    """Any date range (e.g. a quarter), solved as overlapping rolling windows."""
+    start_date: datetime.date
+    end_date: datetime.date  # Inclusive
+    employees: List[EmployeeConfig]
+    constraints: List[UnavailabilityConstraint] = []  # Must carry `date`
+    config: SolverConfig = SolverConfig()
+    shift_types: Optional[List[ShiftType]] = None
+    history: Optional[List["ShiftAssignment"]] = None  # Dated, fixed assignments before start_date
+    window_days: int = Field(28, ge=4)  # Days optimised together
+    commit_days: int = Field(14, ge=1)  # Days frozen after each window; the rest is re-solved by the next one
 
 # --- Output Models ---
 
 class ShiftAssignment(BaseModel):
     day: int
+    date: Optional[datetime.date] = None
     day_name: str
     morning_employee: Optional[str]
     night_employee: Optional[str]
     is_shabbat_morning: bool
     is_shabbat_night: bool
+    holiday: Optional[str] = None  # Jewish holiday on this day, or "Erev <holiday>" on its eve
+    shifts: Optional[Dict[str, List[str]]] = None  # Shift name -> employees; only set for custom shift_types
+
+class ConflictReason(BaseModel):
+    """One rule of a conflicting subset: together, the reasons of an explanation cannot all hold."""
+    rule: str  # unavailability, coverage, or one of the per-employee rules in core.EMPLOYEE_RULES
+    message: str
+    employee: Optional[str] = None
+    date: Optional[datetime.date] = None
+    shift: Optional[str] = None
+    constraint_index: Optional[int] = None  # Position in ScheduleRequest.constraints (unavailability only)
 
 class EmployeeStats(BaseModel):
     total_shifts: int
@@ -47,13 +124,116 @@ class EmployeeStats(BaseModel):
     max_shifts_req: int
     min_shabbat_req: int
     max_shabbat_req: int
+    holiday_shifts: int = 0
+    min_holiday_req: int = 0
+    max_holiday_req: Optional[int] = None
 
 class SolverMetadata(BaseModel):
     status: str
     objective_value: float
     wall_time: float
+    build_time: float = 0.0  # Seconds spent building the CP model (not included in wall_time)
+    serialize_time: float = 0.0  # Seconds spent turning the solver's values into this response
+    cache_hit: bool = False  # True when served from the solution cache without solving
+    screened: bool = False  # True when rejected as INFEASIBLE by the pre-solve screening, without a model
+    request_key: Optional[str] = None  # Canonical request hash; pass as previous_request_key to warm-start
+    parameters: Dict[str, Any] = {}  # CP-SAT parameters the solve actually ran with
+    validate_time: float = 0.0  # Seconds spent validating the request inside the solver worker
+    encode_time: float = 0.0  # Seconds spent encoding this response for the trip back from the worker
+    conflicts: int = 0  # CP-SAT search statistics
+    branches: int = 0
+    num_booleans: int = 0
+    num_constraints: int = 0
+    best_bound: Optional[float] = None  # Proven bound on the objective; equals objective_value when OPTIMAL
+    explain_time: float = 0.0  # Seconds spent finding the conflict of an INFEASIBLE request
+    interchangeable_employees: int = 0  # Employees with at least one identical colleague (see symmetry_breaking)
+    # (seconds into the search, objective) of every improving schedule, to compare engines by quality over time
+    objective_trace: List[Tuple[float, float]] = []
+    neighbourhoods: int = 0  # LNS only: sub-models solved
+    gap: Optional[float] = None  # |objective - best_bound| / max(1, |objective|); 0 when OPTIMAL
+    first_solution_time: Optional[float] = None  # Seconds from the start of the search to the first schedule
+    stop_reason: Optional[str] = None  # optimal | gap | stall | first_solution | time_limit | stopped | infeasible
 
 class ScheduleResponse(BaseModel):
     metadata: SolverMetadata
     schedule: List[ShiftAssignment]
-    statistics: Dict[str, EmployeeStats]
\ No newline at end of file
+    statistics: Dict[str, EmployeeStats]
+    explanation: Optional[List[ConflictReason]] = None  # Conflicting rules when INFEASIBLE
+
+
+class HorizonResponse(BaseModel):
+    metadata: SolverMetadata  # status of the horizon as a whole; times are summed over windows
+    schedule: List[ShiftAssignment]
+    statistics: Dict[str, Dict[str, EmployeeStats]]  # "YYYY-MM" -> employee -> stats
+    windows: List[SolverMetadata]  # One entry per rolling window, in order
+    explanation: Optional[List[ConflictReason]] = None  # Conflict of the window that turned out INFEASIBLE
+
+
+ScheduleRequest.model_rebuild()
+HorizonRequest.model_rebuild()
+
+# --- Sweep Models ---
+
+class WeightRange(BaseModel):
+    start: int = Field(ge=0)
+    stop: int = Field(ge=0)  # Inclusive
+    step: int = Field(1, ge=1)
+
+    def values(self) -> List[int]:
+        return list(range(self.start, self.stop + 1, self.step))
+
+class SweepRequest(ScheduleRequest):
+    """A monthly request solved once per (weight_deficit, weight_balance) pair of the grid; config weights are ignored."""
+    deficit_weights: Union[List[int], WeightRange] = [1, 2, 5, 10, 20, 50, 100]
+    balance_weights: Union[List[int], WeightRange] = [1]
+
+class SweepVariant(BaseModel):
+    weight_deficit: int
+    weight_balance: int
+    status: str
+    objective_value: float = 0.0
+    total_deficit: Optional[int] = None  # Shifts missing from min_shifts, summed over employees
+    total_imbalance: Optional[int] = None  # |morning - night| summed over employees
+    wall_time: float = 0.0
+    on_front: bool = False
+
+class SweepPoint(BaseModel):
+    """A non-dominated schedule: no other variant has both less deficit and less imbalance."""
+    weight_deficit: int  # First weights (in grid order) that produced it
+    weight_balance: int
+    total_deficit: int
+    total_imbalance: int
+    result: ScheduleResponse
+
+class SweepResponse(BaseModel):
+    metadata: SolverMetadata  # wall_time of the whole sweep; status OPTIMAL only if every variant was
+    front: List[SweepPoint] = []  # Pareto front, by increasing total_deficit
+    variants: List[SweepVariant] = []  # Every weight pair, in grid order
+    explanation: Optional[List[ConflictReason]] = None  # Conflicting rules when INFEASIBLE
+
+# --- Job Models ---
+
+class JobInfo(BaseModel):
+    job_id: str
+    status: str  # queued | running | done | failed | cancelled
+    submitted_at: float
+    finished_at: Optional[float] = None
+    result: Optional[Union[ScheduleResponse, HorizonResponse, SweepResponse]] = None
+    error: Optional[str] = None
+
+
+# --- Batch Models ---
+
+class BatchScheduleRequest(BaseModel):
+    requests: List[ScheduleRequest]
+    deadline_seconds: Optional[float] = None  # Global budget for the whole batch
+
+class BatchItemResult(BaseModel):
+    index: int  # Position in BatchScheduleRequest.requests
+    status: str  # done | failed | timeout
+    result: Optional[ScheduleResponse] = None
+    error: Optional[str] = None
+
+class BatchScheduleResponse(BaseModel):
+    results: List[BatchItemResult]
+    wall_time: float
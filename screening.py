@@ -0,0 +1,103 @@
+from typing import List
+
+import numpy as np
+
+from models import ScheduleRequest, ConflictReason
+from core import WorkforceSchedulerEngine
+
+
+def _window_bound(num_days: int, size: int, limit: int) -> int:
+    # Most days out of `num_days` that can be worked when any `size` consecutive days hold at most `limit`
+    return (num_days // size) * limit + min(num_days % size, limit)
+
+
+def screen(request: ScheduleRequest) -> List[ConflictReason]:
+    """
+    Counting checks that prove a request INFEASIBLE without building the CP model: coverage per shift and
+    per day after unavailability, monthly capacity against demand (max_shifts and the consecutive-day rules),
+    and Shabbat / holiday minimums and maximums against their slots. Every check only uses upper bounds on what
+    the model allows, so a request that passes may still be infeasible, but one that fails never is feasible.
+    Returns the reasons found (empty = passed).
+    """
+    engine = WorkforceSchedulerEngine(request)
+    engine._compute_eligibility()
+    eligible = engine.eligible  # (days, shifts, employees)
+    employees = request.employees
+    headcount = np.array([st.headcount for st in engine.shift_types])
+    reasons = []
+
+    # Coverage: each shift needs `headcount` available employees, each day the sum of them (one shift a day)
+    available = eligible.sum(axis=2)
+    works = eligible.any(axis=1)  # (days, employees): could work some shift that day
+    short_days = set()
+    for d, s in zip(*(i.tolist() for i in np.nonzero(available < headcount))):
+        st, dt = engine.shift_types[s], engine.dates[d]
+        short_days.add(d)
+        reasons.append(ConflictReason(
+            rule="coverage", date=dt, shift=st.name,
+            message=f"Only {available[d, s]} employee(s) can work the {st.name} shift on {dt}, {st.headcount} needed"))
+    for d in np.flatnonzero(works.sum(axis=1) < headcount.sum()).tolist():
+        if d not in short_days:
+            reasons.append(ConflictReason(
+                rule="coverage", date=engine.dates[d],
+                message=f"Only {works[d].sum()} employee(s) can work on {engine.dates[d]}, "
+                        f"{headcount.sum()} needed (one shift a day)"))
+
+    max_shifts = np.array([e.max_shifts for e in employees])
+    min_shabbat = np.array([e.min_shabbat for e in employees])
+    max_shabbat = np.array([e.max_shabbat for e in employees])
+    min_holiday = np.array([e.min_holiday for e in employees])
+    # No limit is the same as a limit no month can reach
+    max_holiday = np.array([e.max_holiday if e.max_holiday is not None else 2 * 31 for e in employees])
+    for seg in engine.segments:
+        first, last = seg["days"][0], seg["days"][-1]
+        num_days = last - first + 1
+        label = f"{seg['year']:04d}-{seg['month']:02d}"
+
+        # Capacity: the shifts each employee can still take this month, against the shifts to fill
+        max_left = np.maximum(0, max_shifts - seg["carry"][0] - seg["carry"][1])
+        capacity = np.minimum(np.minimum(max_left, works[first:last + 1].sum(axis=0)),
+                              _window_bound(num_days, 4, 3))
+        if capacity.sum() < headcount.sum() * num_days:
+            reasons.append(ConflictReason(
+                rule="capacity",
+                message=f"Employees can work at most {capacity.sum()} shifts in {label} "
+                        f"(max_shifts, availability, 3 days in 4), {headcount.sum() * num_days} needed"))
+        for s, st in enumerate(engine.shift_types):
+            capacity_s = np.minimum(np.minimum(capacity, eligible[first:last + 1, s].sum(axis=0)),
+                                    _window_bound(num_days, 3, 2))
+            if capacity_s.sum() < st.headcount * num_days:
+                reasons.append(ConflictReason(
+                    rule="capacity", shift=st.name,
+                    message=f"Employees can work at most {capacity_s.sum()} {st.name} shifts in {label} "
+                            f"(same shift at most 2 times in 3 days), {st.headcount * num_days} needed"))
+
+        # Shabbat and holidays: their slots are filled exactly, by at most one shift per employee and day
+        for kind, mask, minimum, maximum, carry in (
+                ("shabbat", engine.shabbat_mask, min_shabbat, max_shabbat, seg["carry"][2]),
+                ("holiday", engine.holiday_mask, min_holiday, max_holiday, seg["carry"][3])):
+            title = kind.capitalize()
+            slots = mask[first:last + 1]
+            supply = int((slots * headcount).sum())
+            slot_days = (eligible[first:last + 1] & slots[:, :, None]).any(axis=1).sum(axis=0)
+            kind_capacity = np.minimum(np.minimum(slot_days, np.maximum(0, maximum - carry)), capacity)
+            if kind_capacity.sum() < supply:
+                reasons.append(ConflictReason(
+                    rule=f"max_{kind}",
+                    message=f"Employees can work at most {kind_capacity.sum()} {title} shifts in {label}, "
+                            f"{supply} {title} slots to fill"))
+            if seg["closes_month"]:
+                # Same pro-rating as the model's minimum constraints
+                target = minimum if seg["share"] == 1 else (minimum * seg["share"]).astype(int)
+                need = np.maximum(0, target - carry)
+                if need.sum() > supply:
+                    reasons.append(ConflictReason(
+                        rule=f"min_{kind}",
+                        message=f"{title} minimums add up to {need.sum()} shifts in {label}, "
+                                f"only {supply} {title} slots exist"))
+                for e in np.flatnonzero(need > kind_capacity).tolist():
+                    reasons.append(ConflictReason(
+                        rule=f"min_{kind}", employee=employees[e].name,
+                        message=f"{employees[e].name} must work {need[e]} {title} shifts in {label}, "
+                                f"but can work at most {kind_capacity[e]}"))
+    return reasons
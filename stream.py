@@ -0,0 +1,41 @@
+import json
+import asyncio
+from typing import AsyncIterator
+
+from jobs import SolverJobQueue
+
+# How long one wait for the next solution may hold a thread before checking whether the job finished
+POLL_INTERVAL = 0.25
+
+
+def sse(event: str, data: dict) -> str:
+    """One Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def solution_events(queue: SolverJobQueue, job_id: str) -> AsyncIterator[str]:
+    """
+    SSE frames of a streaming job: `job` with the id (needed to stop it), one `solution` per improving
+    schedule (its metadata carries objective_value, best_bound and wall_time so far), then `done` with the
+    final response, or `error`. If the client goes away the search is stopped and its worker freed.
+    """
+    yield sse("job", {"job_id": job_id})
+    future = queue.future(job_id)
+    try:
+        while not future.done():
+            event = await asyncio.to_thread(queue.next_event, job_id, POLL_INTERVAL)
+            if event is not None:
+                yield sse("solution", event)
+        for event in queue.drain_events(job_id):
+            yield sse("solution", event)
+
+        if future.cancelled():
+            yield sse("error", {"detail": "Job was cancelled"})
+        elif future.exception() is not None:
+            yield sse("error", {"detail": str(future.exception())})
+        else:
+            yield sse("done", future.result())
+    finally:
+        if not future.done():
+            # Client disconnected mid-search
+            queue.cancel(job_id)
@@ -0,0 +1,160 @@
+import math
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from ortools.sat.python import cp_model
+
+from models import SweepRequest, SweepResponse, SweepVariant, SweepPoint, SolverMetadata, WeightRange
+from core import WorkforceSchedulerEngine, solve_cores
+
+
+def _values(weights) -> List[int]:
+    return weights.values() if isinstance(weights, WeightRange) else list(weights)
+
+
+def weight_grid(request: SweepRequest) -> List[Tuple[int, int]]:
+    """(weight_deficit, weight_balance) pairs in grid order, without pairs of the same ratio as an earlier one."""
+    pairs, ratios = [], set()
+    for w_def in _values(request.deficit_weights):
+        for w_bal in _values(request.balance_weights):
+            g = math.gcd(w_def, w_bal) or 1
+            if (w_def // g, w_bal // g) in ratios:
+                continue  # (10, 1) and (20, 2) have the same optimal schedules
+            ratios.add((w_def // g, w_bal // g))
+            pairs.append((w_def, w_bal))
+    return pairs
+
+
+def pareto_front(points: List[Tuple[int, int]]) -> List[int]:
+    """
+    Positions of the non-dominated (deficit, imbalance) points by increasing deficit; of equal points
+    only the first is kept.
+    """
+    front, best_imbalance = [], math.inf
+    for i in sorted(range(len(points)), key=lambda i: (points[i], i)):
+        if points[i][1] < best_imbalance:
+            front.append(i)
+            best_imbalance = points[i][1]
+    return front
+
+
+class WeightSweepEngine:
+    """
+    Solves one monthly request for every weight pair of a grid and returns the deficit-vs-imbalance Pareto front.
+    The model is built once; each variant solves a clone of it with its own objective, on a thread of its own
+    (CP-SAT releases the GIL), with the cores and the request's time limit split between them so the whole
+    sweep takes about as long as one solve. Variants that start later are hinted with the best schedule found
+    so far under their weights.
+    """
+
+    def __init__(self, request: SweepRequest, concurrent_solves: int = 1):
+        self.req = request
+        self.grid = weight_grid(request)
+        if not self.grid:
+            raise ValueError("The weight grid is empty")
+        self.engine = WorkforceSchedulerEngine(request, concurrent_solves)
+
+        # Variants run side by side on the job's cores, and share its CP-SAT threads
+        workers = self.engine.parameters["num_workers"]
+        self.parallel = min(len(self.grid), solve_cores(concurrent_solves))
+        self.rounds = math.ceil(len(self.grid) / self.parallel)
+        self.parameters = {
+            **self.engine.parameters,
+            "num_workers": max(1, workers // self.parallel),
+            "max_time_in_seconds": self.engine.parameters["max_time_in_seconds"] / self.rounds,
+        }
+        self._solutions: List[Tuple[int, int, list]] = []  # (deficit, imbalance, solution) of finished variants
+        self._lock = threading.Lock()
+
+    def solve(self) -> SweepResponse:
+        self.engine.build()
+        start = time.perf_counter()
+
+        # The first round spreads over the whole curve; later rounds fill the gaps, hinted by their neighbours
+        by_ratio = sorted(range(len(self.grid)), key=lambda i: self.grid[i][0] / max(1, sum(self.grid[i])))
+        order = [i for r in range(self.rounds) for i in by_ratio[r::self.rounds]]
+        results = [None] * len(self.grid)
+        with ThreadPoolExecutor(self.parallel) as pool:
+            for i, result in zip(order, pool.map(self._solve_variant, [self.grid[i] for i in order])):
+                results[i] = result
+        wall_time = time.perf_counter() - start
+
+        variants = [variant for variant, _ in results]
+        solved = [i for i, (_, response) in enumerate(results) if response is not None]
+        front = []
+        for k in pareto_front([(variants[i].total_deficit, variants[i].total_imbalance) for i in solved]):
+            variant, response = results[solved[k]]
+            variant.on_front = True
+            front.append(SweepPoint(weight_deficit=variant.weight_deficit, weight_balance=variant.weight_balance,
+                                    total_deficit=variant.total_deficit, total_imbalance=variant.total_imbalance,
+                                    result=response))
+
+        statuses = [v.status for v in variants]
+        if solved:
+            status = "OPTIMAL" if all(s == "OPTIMAL" for s in statuses) else "FEASIBLE"
+        else:
+            status = statuses[0]  # The hard rules are the same for every variant
+        explanation = None
+        if status == "INFEASIBLE" and self.req.config.explain_infeasible:
+            explanation = self.engine.explain()
+
+        responses = [response for _, response in results if response is not None]
+        return SweepResponse(
+            metadata=SolverMetadata(
+                status=status,
+                objective_value=0.0,  # Every variant has its own; see `variants`
+                wall_time=wall_time,  # Elapsed time of the parallel solves, not their sum
+                build_time=self.engine.build_time,
+                parameters=self.parameters,
+                conflicts=sum(r.metadata.conflicts for r in responses),
+                branches=sum(r.metadata.branches for r in responses),
+                num_booleans=max((r.metadata.num_booleans for r in responses), default=0),
+                num_constraints=self.engine.num_constraints,
+                explain_time=self.engine.explain_time,
+                interchangeable_employees=sum(len(members) for members in self.engine.symmetry_classes)
+            ),
+            front=front,
+            variants=variants,
+            explanation=explanation
+        )
+
+    def _solve_variant(self, weights: Tuple[int, int]):
+        w_def, w_bal = weights
+        engine = self.engine
+        model = engine.model.Clone()
+        engine._set_objective(model, w_def, w_bal)
+        hint = self._best_solution(w_def, w_bal)
+        if hint is not None:
+            model.ClearHints()
+            for i, value in enumerate(hint):
+                model.AddHint(model.GetIntVarFromProtoIndex(i), value)
+
+        solver = cp_model.CpSolver()
+        engine._apply_parameters(solver, self.parameters)
+        status_val = solver.Solve(model)
+        status_name = solver.StatusName(status_val)
+        response = solver.ResponseProto()
+        variant = SweepVariant(weight_deficit=w_def, weight_balance=w_bal, status=status_name,
+                               wall_time=response.wall_time)
+        if status_val not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+            return variant, None
+
+        deficit, imbalance = engine.objective_totals(engine._solution_values(response))
+        with self._lock:
+            self._solutions.append((deficit, imbalance, list(response.solution)))
+        result = engine._serialize_solution(status_name, response)
+        result.metadata.parameters = self.parameters
+        if result.metadata.status == "OPTIMAL" and result.metadata.gap:
+            variant.status = result.metadata.status = "FEASIBLE"  # Stopped by a gap limit, see core.solve()
+        variant.objective_value = response.objective_value
+        variant.total_deficit, variant.total_imbalance = deficit, imbalance
+        return variant, result
+
+    def _best_solution(self, w_def: int, w_bal: int) -> Optional[list]:
+        # The finished variant whose schedule scores best under these weights
+        with self._lock:
+            if not self._solutions:
+                return None
+            return min(self._solutions, key=lambda s: w_def * s[0] + w_bal * s[1])[2]
@@ -1,5 +1,9 @@
+import json
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-import requests
 import pandas as pd
 # Import the new agent
 import sys
@@ -8,9 +12,79 @@ import os
 # Add parent dir to path so we can import 'agent'
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from agent.constraint_agent import agent
+from agent.api_client import SchedulerAPIClient
+from calendar_index import month_index
 
 # Configuration
-API_URL = "http://localhost:8000/schedule"
+API_BASE_URL = "http://localhost:8000"
+
+
+@st.cache_resource
+def get_api_client():
+    # One client per server process: its connection pool survives Streamlit's reruns
+    return SchedulerAPIClient(API_BASE_URL)
+
+
+api_client = get_api_client()
+
+
+@st.cache_resource
+def get_background_pool():
+    # Runs weight sweeps off the script thread, like SolveRun does for single solves
+    return ThreadPoolExecutor(max_workers=4)
+
+PAGE_SIZE = 50  # Rows per page in the tables; larger rosters get a page picker
+RESULT_CACHE_SIZE = 20  # Solved payloads kept per browser session
+
+
+def payload_key(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SolveRun:
+    """
+    A streaming solve consumed on a background thread, so the script (and every widget) stays responsive.
+    The thread only writes these attributes; the page reads them on its polling reruns.
+    """
+
+    def __init__(self, key: str, payload: dict):
+        self.key = key
+        self.job_id = None
+        self.latest = None  # Best schedule so far
+        self.result = None  # Final response
+        self.error = None
+        self.done = False
+        self.stopped = False  # Stopped from the page: the best schedule so far is the answer
+        threading.Thread(target=self._consume, args=(payload,), daemon=True).start()
+
+    def _consume(self, payload: dict):
+        try:
+            for event, data in api_client.stream_schedule(payload):
+                if event == "job":
+                    self.job_id = data["job_id"]
+                elif event == "solution":
+                    self.latest = data
+                elif event == "done":
+                    self.result = data
+                elif event == "error":
+                    self.error = data["detail"]
+        except Exception as e:
+            self.error = str(e)
+        self.done = True
+
+    def stop(self):
+        self.stopped = True
+        if self.job_id is not None:
+            api_client.stop_job(self.job_id)
+
+
+def show_table(df: pd.DataFrame, key: str, **kwargs):
+    """st.dataframe that only sends one page of a large table to the browser."""
+    pages = max(1, -(-len(df) // PAGE_SIZE))
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+        df = df.iloc[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+    st.dataframe(df, **kwargs)
 
 
 # --- Helper: Default Data ---
@@ -26,8 +100,21 @@ def get_default_employees():
 
 
 # --- Initialize Session State ---
+def warm_up_model():
+    try:
+        asyncio.run(agent.warm_up())
+    except Exception:
+        pass  # Ollama not running yet; parsing reports it
+
+
 if "constraints" not in st.session_state:
     st.session_state.constraints = []
+    st.session_state.results = {}  # payload_key -> response
+    st.session_state.run = None
+    st.session_state.sweeps = {}  # payload_key (without weights) -> sweep response
+    st.session_state.sweep = None  # (key, future) of the sweep in flight
+    # Load the model on a background thread during the first page view, so the first parse does not wait for it
+    threading.Thread(target=warm_up_model, daemon=True).start()
 
 st.set_page_config(page_title="Scheduler Control Panel", layout="wide")
 st.title("🗓️ Workforce Scheduler Control Panel")
@@ -37,6 +124,9 @@ with st.sidebar:
     st.header("1. Calendar Settings")
     year = st.number_input("Year", value=2026, step=1)
     month = st.number_input("Month", value=2, min_value=1, max_value=12)
+    holidays = month_index(year, month).holidays
+    if holidays:
+        st.caption("Holidays: " + ", ".join(f"{day}: {name}" for day, name in holidays.items()))
 
     st.header("2. Objectives")
     w_deficit = st.slider("Weight: Min Shift Deficit", 0, 100, 10)
@@ -63,14 +153,18 @@ with col_ai_actions:
             # 1. Get valid names for validation context
             valid_names = [e["name"] for e in get_default_employees()]
 
-            # 2. Call the Agent
-            new_constraints = agent.parse_constraints(user_text, year, month, valid_names)
+            # 2. Call the Agent (every sentence is parsed on its own, in parallel)
+            parsed = asyncio.run(agent.parse_constraints_async(user_text, year, month, valid_names))
+            new_constraints = parsed.constraints
 
             if new_constraints:
                 st.session_state.constraints.extend(new_constraints)
                 st.success(f"Added {len(new_constraints)} constraints!")
-            else:
-                st.warning("Could not understand constraints or valid names/dates not found.")
+            for failure in parsed.failures:
+                st.warning(f"Could not understand: \"{failure['clause']}\" ({failure['error']})")
+            stats = agent.stats()
+            st.caption(f"Parsed without the LLM: {stats['fast_path_share']:.0%} · "
+                       f"LLM cache hit rate: {stats['cache_hit_rate']:.0%} ({stats['llm_calls']} model calls)")
         else:
             st.info("Please write something first.")
 
@@ -90,8 +184,9 @@ if st.session_state.constraints:
 
 
     c_df["shift_display"] = c_df["shift"].apply(map_shift)
-    st.dataframe(
+    show_table(
         c_df[["employee_name", "day", "shift_display"]],
+        key="constraints",
         use_container_width=True,
         hide_index=True
     )
@@ -103,41 +198,134 @@ if st.session_state.constraints:
 st.divider()
 
 # --- MAIN ACTION ---
-if st.button("🚀 Generate Final Schedule", type="primary", use_container_width=True):
-
-    payload = {
-        "year": year,
-        "month": month,
-        "employees": get_default_employees(),
-        "constraints": st.session_state.constraints,
-        "config": {
-            "weight_deficit": w_deficit,
-            "weight_balance": w_balance
-        }
+def render_result(data, live=False):
+    metadata = data["metadata"]
+    if live:
+        bound = metadata.get("best_bound")
+        st.info(f"Searching... best so far: {metadata['objective_value']:g}"
+                f"{f' (bound {bound:g})' if bound is not None else ''} after {metadata['wall_time']:.1f}s")
+    elif metadata["status"] in ["OPTIMAL", "FEASIBLE"]:
+        gap = metadata.get("gap")
+        note = f" (within {gap:.1%} of optimal, stopped by {metadata.get('stop_reason')})" if gap else ""
+        st.success(f"Solved! Status: {metadata['status']}{note}")
+    else:
+        st.error(f"Solver Failed. Status: {metadata['status']}")
+        if data.get("explanation"):
+            st.write("These rules cannot all hold at once; relax one of them:")
+            for reason in data["explanation"]:
+                st.write(f"- {reason['message']}")
+        return
+
+    # Show Schedule
+    schedule_df = pd.DataFrame(data["schedule"])
+    display_df = schedule_df[
+        ["day", "day_name", "morning_employee", "night_employee", "is_shabbat_morning", "is_shabbat_night", "holiday"]]
+    show_table(display_df, key="schedule_live" if live else "schedule", use_container_width=True)
+
+    # Show Stats
+    st.write("### Employee Statistics")
+    stats_df = pd.DataFrame(data["statistics"]).T
+    show_table(stats_df, key="stats_live" if live else "stats")
+
+
+payload = {
+    "year": year,
+    "month": month,
+    "employees": get_default_employees(),
+    "constraints": st.session_state.constraints,
+    "config": {
+        "weight_deficit": w_deficit,
+        "weight_balance": w_balance
     }
+}
+key = payload_key(payload)
+results = st.session_state.results
 
-    with st.spinner("Solving..."):
-        try:
-            response = requests.post(API_URL, json=payload)
-            response.raise_for_status()
-            data = response.json()
-
-            metadata = data["metadata"]
-            if metadata["status"] in ["OPTIMAL", "FEASIBLE"]:
-                st.success(f"Solved! Status: {metadata['status']}")
-
-                # Show Schedule
-                schedule_df = pd.DataFrame(data["schedule"])
-                display_df = schedule_df[
-                    ["day", "day_name", "morning_employee", "night_employee", "is_shabbat_morning", "is_shabbat_night"]]
-                st.dataframe(display_df, use_container_width=True)
-
-                # Show Stats
-                st.write("### Employee Statistics")
-                stats_df = pd.DataFrame(data["statistics"]).T
-                st.dataframe(stats_df)
-            else:
-                st.error(f"Solver Failed. Status: {metadata['status']}")
+if st.button("🚀 Generate Final Schedule", type="primary", use_container_width=True) and key not in results:
+    run = st.session_state.run
+    if run is not None and not run.done:
+        run.stop()  # The settings changed mid-search; that schedule is no longer wanted
+    st.session_state.run = SolveRun(key, payload)
 
-        except Exception as e:
-            st.error(f"Error: {str(e)}")
\ No newline at end of file
+
+@st.fragment(run_every=1.0)
+def solve_progress():
+    # Re-runs on its own every second while a solve is in flight; the rest of the page is left alone
+    run = st.session_state.run
+    if run is None:
+        return
+    if run.done:
+        st.session_state.run = None
+        # An intermediate schedule only stands in for the final one after a deliberate stop; when the stream
+        # failed it is not kept, so generating again solves again
+        result = run.result or (run.latest if run.stopped else None)
+        if result is None:
+            st.session_state.solve_error = run.error or "the solve ended without a schedule"
+        else:
+            results[run.key] = result
+            while len(results) > RESULT_CACHE_SIZE:
+                results.pop(next(iter(results)))  # Oldest first
+        st.rerun()  # Show the outcome in the main page
+
+    # Stopping makes the solve finish with the best schedule so far, which is then kept like any other result
+    st.button("⏹ Stop & keep current schedule", on_click=run.stop)
+    if run.latest is not None:
+        render_result(run.latest, live=True)
+    else:
+        st.info("Solving...")
+
+
+if st.session_state.run is not None:
+    solve_progress()
+
+if st.session_state.get("solve_error"):
+    st.error(f"Error: {st.session_state.pop('solve_error')}")
+
+# Results are kept per payload, so reruns and settings moved back to earlier values show them instantly
+if key in results:
+    render_result(results[key])
+elif results:
+    st.caption("The settings changed since the last solve; generate the schedule again to see the new one.")
+
+# --- SECTION: WEIGHT TRADE-OFF ---
+st.divider()
+st.subheader("📈 Deficit vs. Balance Trade-off")
+st.caption("Solves the month for a range of weights at once and shows the schedules no other weighting beats "
+           "on both missing shifts and morning/night imbalance.")
+
+sweep_payload = {**payload, "config": {}, "deficit_weights": [1, 2, 5, 10, 20, 50, 100], "balance_weights": [1, 2, 5]}
+sweep_key = payload_key(sweep_payload)
+if st.button("Explore weights", use_container_width=True) and sweep_key not in st.session_state.sweeps:
+    st.session_state.sweep = (sweep_key, get_background_pool().submit(api_client.sweep, sweep_payload))
+
+
+@st.fragment(run_every=1.0)
+def sweep_progress():
+    if st.session_state.sweep is None:
+        return
+    key, future = st.session_state.sweep
+    if not future.done():
+        st.info("Sweeping weights...")
+        return
+    st.session_state.sweep = None
+    result = future.result()
+    if "error" in result:
+        st.session_state.solve_error = result["error"]
+    else:
+        st.session_state.sweeps[key] = result
+    st.rerun()
+
+
+if st.session_state.sweep is not None:
+    sweep_progress()
+
+sweep = st.session_state.sweeps.get(sweep_key)
+if sweep is not None:
+    if not sweep["front"]:
+        st.error(f"No schedule found. Status: {sweep['metadata']['status']}")
+    else:
+        front_df = pd.DataFrame([{k: p[k] for k in ("weight_deficit", "weight_balance", "total_deficit",
+                                                    "total_imbalance")} for p in sweep["front"]])
+        st.scatter_chart(front_df, x="total_deficit", y="total_imbalance")
+        show_table(front_df, key="front", use_container_width=True, hide_index=True)
+        st.caption("Set the objective sliders to a row's weights to generate that schedule.")
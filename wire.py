@@ -0,0 +1,228 @@
+import json
+import zlib
+import hashlib
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library is slower and spells some floats differently (1e-05)
+    orjson = None
+try:
+    import msgpack
+except ImportError:  # Optional: without it MessagePack is not offered
+    msgpack = None
+
+# --- CONFIGURATION ---
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.scheduler.columnar+json"
+MSGPACK = "application/msgpack"
+COLUMNAR_MSGPACK = "application/vnd.scheduler.columnar+msgpack"
+COLUMNAR = {COLUMNAR_JSON, COLUMNAR_MSGPACK}
+
+# Largest request body accepted after decompression, so a small gzip bomb cannot exhaust memory
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+
+# Timings and search statistics differ between two solves that found the same schedule; the ETag ignores them
+VOLATILE_METADATA = {"wall_time", "build_time", "serialize_time", "validate_time", "encode_time", "explain_time",
+                     "first_solution_time", "objective_trace", "conflicts", "branches", "cache_hit"}
+
+# Schedule columns holding an employee name; the columnar layout sends them as indices into `names`
+EMPLOYEE_COLUMNS = {"morning_employee", "night_employee"}
+
+
+class UnsupportedEncodingError(Exception):
+    """Raised for a request Content-Encoding other than gzip, deflate or identity."""
+
+
+class BodyTooLargeError(Exception):
+    """Raised when a compressed request body expands past MAX_REQUEST_BYTES."""
+
+
+def media_types() -> List[str]:
+    offered = [JSON, COLUMNAR_JSON]
+    if msgpack is not None:
+        offered += [MSGPACK, COLUMNAR_MSGPACK]
+    return offered
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """The offered media type the Accept header prefers (JSON when it is missing), or None if none is acceptable."""
+    if not accept:
+        return JSON
+    offered = media_types()
+    ranked = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranked.append((-quality, position, media_type.lower()))
+    for _, _, media_type in sorted(ranked):
+        if media_type in offered:
+            return media_type
+        if media_type in ("*/*", "application/*"):
+            return JSON
+    return None
+
+
+# --- Columnar layout ---
+
+def _name_table(response: dict) -> List[str]:
+    # Employees in order of first appearance: statistics first (every employee), then anyone only in the schedule
+    names: Dict[str, None] = {}
+    stats = response["statistics"]
+    for per_employee in (stats.values() if "windows" in response else [stats]):
+        names.update(dict.fromkeys(per_employee))
+    for row in response["schedule"]:
+        names.update(dict.fromkeys(row[c] for c in EMPLOYEE_COLUMNS if row.get(c) is not None))
+        for employees in (row.get("shifts") or {}).values():
+            names.update(dict.fromkeys(employees))
+    return list(names)
+
+
+def _stats_columns(stats: Dict[str, dict], index: Dict[str, int]) -> dict:
+    columns: Dict[str, list] = {"employee": [index[name] for name in stats]}
+    for values in stats.values():
+        for field, value in values.items():
+            columns.setdefault(field, []).append(value)
+    return columns
+
+
+def _stats_rows(columns: dict, names: List[str]) -> Dict[str, dict]:
+    fields = [f for f in columns if f != "employee"]
+    return {names[i]: {f: columns[f][row] for f in fields} for row, i in enumerate(columns["employee"])}
+
+
+def to_columnar(response: dict) -> dict:
+    """
+    Schedule or horizon response with parallel arrays instead of one object per day: `schedule` maps each
+    ShiftAssignment field to a list over days, employees appear as indices into `names` (sent once), and
+    `statistics` is one array per EmployeeStats field. from_columnar() restores the row layout.
+    """
+    names = _name_table(response)
+    index = {name: i for i, name in enumerate(names)}
+    rows = response["schedule"]
+
+    schedule: Dict[str, list] = {}
+    for row in rows:
+        for field, value in row.items():
+            schedule.setdefault(field, [])
+    for field, column in schedule.items():
+        for row in rows:
+            value = row.get(field)
+            if field in EMPLOYEE_COLUMNS and value is not None:
+                value = index[value]
+            elif field == "shifts" and value is not None:
+                value = {shift: [index[n] for n in employees] for shift, employees in value.items()}
+            column.append(value)
+
+    stats = response["statistics"]
+    columnar = {**response, "layout": "columnar", "names": names, "days": len(rows), "schedule": schedule}
+    if "windows" in response:
+        columnar["statistics"] = {month: _stats_columns(s, index) for month, s in stats.items()}
+    else:
+        columnar["statistics"] = _stats_columns(stats, index)
+    return columnar
+
+
+def from_columnar(columnar: dict) -> dict:
+    """Inverse of to_columnar()."""
+    names = columnar["names"]
+    schedule = columnar["schedule"]
+    rows = []
+    for day in range(columnar["days"]):
+        row = {}
+        for field, column in schedule.items():
+            value = column[day]
+            if field in EMPLOYEE_COLUMNS and value is not None:
+                value = names[value]
+            elif field == "shifts" and value is not None:
+                value = {shift: [names[i] for i in employees] for shift, employees in value.items()}
+            row[field] = value
+        rows.append(row)
+
+    response = {k: v for k, v in columnar.items() if k not in ("layout", "names", "days")}
+    response["schedule"] = rows
+    stats = columnar["statistics"]
+    if "windows" in columnar:
+        response["statistics"] = {month: _stats_rows(s, names) for month, s in stats.items()}
+    else:
+        response["statistics"] = _stats_rows(stats, names)
+    return response
+
+
+# --- Encoding ---
+
+def _sorted(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _sorted(value[k]) for k in sorted(value)}
+    if isinstance(value, list):
+        return [_sorted(v) for v in value]
+    return value
+
+
+def encode(data: Any, media_type: str = JSON) -> bytes:
+    """
+    Canonical bytes of `data`: keys sorted at every level and no whitespace, so the same response always
+    encodes to the same body (and can be cached or compared byte for byte). orjson and the standard library
+    format some floats differently, so JSON bodies are only byte-identical between servers with the same choice.
+    """
+    if media_type in (MSGPACK, COLUMNAR_MSGPACK):
+        return msgpack.packb(_sorted(data), use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+    return _std_json(data)
+
+
+def _std_json(data: Any) -> bytes:
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def decode(body: bytes, media_type: str = JSON) -> Any:
+    media_type = media_type.split(";")[0].strip().lower()
+    if media_type in (MSGPACK, COLUMNAR_MSGPACK):
+        return msgpack.unpackb(body, raw=False)
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def etag(data: dict, media_type: str) -> str:
+    """
+    Weak validator of a response in one media type. Timings and search statistics are left out, so two solves
+    that produced the same schedule (or a solve and its cache hit) share it. Hashed from the standard library's
+    encoding, so it does not depend on whether orjson is installed.
+    """
+    def stable(response: dict) -> dict:
+        stripped = dict(response)
+        if isinstance(stripped.get("metadata"), dict):
+            stripped["metadata"] = {k: v for k, v in stripped["metadata"].items() if k not in VOLATILE_METADATA}
+        if isinstance(stripped.get("windows"), list):
+            stripped["windows"] = [{k: v for k, v in w.items() if k not in VOLATILE_METADATA}
+                                   for w in stripped["windows"]]
+        if isinstance(stripped.get("result"), dict):
+            stripped["result"] = stable(stripped["result"])  # JobInfo
+        return stripped
+
+    digest = hashlib.sha256(media_type.encode("utf-8") + b"\n" + _std_json(stable(data))).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def decompress(body: bytes, encoding: Optional[str], max_bytes: int = MAX_REQUEST_BYTES) -> bytes:
+    """Request body with its Content-Encoding (gzip or deflate) removed."""
+    encoding = (encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return body
+    if encoding in ("gzip", "x-gzip"):
+        inflater = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    elif encoding == "deflate":
+        inflater = zlib.decompressobj()
+    else:
+        raise UnsupportedEncodingError(f"Unsupported Content-Encoding: {encoding}")
+    data = inflater.decompress(body, max_bytes + 1)
+    if len(data) > max_bytes:
+        raise BodyTooLargeError(f"Request body is larger than {max_bytes} bytes once decompressed")
+    return data